@@ -4,21 +4,29 @@ Health Check Script for E-Commerce Platform Services
 Demonstrates service health monitoring with Azure integration
 """
 
+import argparse
 import asyncio
 import aiohttp
-import json
+import functools
 import logging
 import os
+import socket
 import sys
-from datetime import datetime
-from typing import Dict, List, Optional
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from types import MappingProxyType
+from typing import Dict, Iterable, List, Optional, Tuple
 from dataclasses import dataclass, asdict
 
+import orjson
+
 from azure.monitor.opentelemetry import configure_azure_monitor
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
+from azure.core.exceptions import ResourceNotFoundError
+from azure.identity.aio import DefaultAzureCredential, ManagedIdentityCredential
+from azure.keyvault.secrets.aio import SecretClient
 from opentelemetry import trace
-from opentelemetry.metrics import get_meter
+from opentelemetry.metrics import CallbackOptions, Observation, get_meter
 
 # Configure logging
 logging.basicConfig(
@@ -53,13 +61,62 @@ health_check_duration = meter.create_histogram(
     unit="s"
 )
 
-service_health_gauge = meter.create_gauge(
+# Latest health status per service (1=healthy, 0=unhealthy), shared by every
+# HealthChecker and observed once per metric collection instead of being set
+# on every check
+_latest_health: Dict[str, int] = {}
+
+def _observe_health(options: CallbackOptions) -> Iterable[Observation]:
+    """Report the health status of each service from the latest checks"""
+    for service_name, healthy in list(_latest_health.items()):
+        yield Observation(healthy, {"service": service_name})
+
+meter.create_observable_gauge(
     name="service_health_status",
+    callbacks=[_observe_health],
     description="Health status of services (1=healthy, 0=unhealthy)",
     unit="1"
 )
 
-@dataclass
+# Direct Power BI push duplicates the OpenTelemetry metrics, so it is off by default
+POWER_BI_DIRECT_PUSH = os.getenv('ENABLE_POWERBI_DIRECT_PUSH', 'false').lower() == 'true'
+
+# Maximum rows per Power BI streaming dataset request
+POWER_BI_BATCH_SIZE = 100
+
+@functools.lru_cache(maxsize=1)
+def _get_credential():
+    """Get the process-wide Azure credential for Key Vault access
+    
+    In-cluster the managed identity is used directly so DefaultAzureCredential
+    does not probe environment, CLI and IDE sources first. The credential is
+    shared so its token cache survives across HealthChecker instances; tests
+    can reset it with _get_credential.cache_clear().
+    """
+    if os.getenv('KUBERNETES_SERVICE_HOST'):
+        return ManagedIdentityCredential(client_id=os.getenv('AZURE_CLIENT_ID'))
+    return DefaultAzureCredential()
+
+@functools.lru_cache(maxsize=1)
+def _get_secret_client() -> Optional[SecretClient]:
+    """Get the process-wide Key Vault client, or None if KEY_VAULT_URL is not set"""
+    key_vault_url = os.getenv('KEY_VAULT_URL')
+    if not key_vault_url:
+        return None
+    return SecretClient(vault_url=key_vault_url, credential=_get_credential())
+
+async def close_azure_clients():
+    """Close the shared Key Vault client and credential"""
+    if _get_secret_client.cache_info().currsize:
+        client = _get_secret_client()
+        if client:
+            await client.close()
+    if _get_credential.cache_info().currsize:
+        await _get_credential().close()
+    _get_secret_client.cache_clear()
+    _get_credential.cache_clear()
+
+@dataclass(slots=True)
 class ServiceHealth:
     """Data class for service health information"""
     service_name: str
@@ -72,135 +129,275 @@ class ServiceHealth:
     
     def __post_init__(self):
         if not self.timestamp:
-            self.timestamp = datetime.utcnow().isoformat()
+            self.timestamp = datetime.now(timezone.utc).isoformat()
+
+# Shared read-only headers for unauthenticated requests
+_NO_HEADERS = MappingProxyType({})
+
+@dataclass(slots=True, frozen=True)
+class ServiceSpec:
+    """Pre-resolved service configuration used by the check loop"""
+    name: str
+    endpoint: str
+    auth_required: bool
 
 class HealthChecker:
     """Main health checker class for monitoring services"""
     
-    def __init__(self, services: List[Dict[str, str]], timeout: int = 10):
+    def __init__(
+        self,
+        services: List[Dict[str, str]],
+        timeout: int = 10,
+        slow_threshold: float = 2.0,
+        secret_ttl: int = 300,
+        secret_negative_ttl: int = 30,
+        metric_emit_interval: float = 60.0
+    ):
         self.services = services
         self.timeout = timeout
-        self.credential = DefaultAzureCredential()
-        self.results: List[ServiceHealth] = []
-        
-        # Initialize Key Vault client if configured
-        self.key_vault_client = None
-        if key_vault_url := os.getenv('KEY_VAULT_URL'):
-            self.key_vault_client = SecretClient(
-                vault_url=key_vault_url,
-                credential=self.credential
+        self._client_timeout = aiohttp.ClientTimeout(total=timeout)
+        self._service_specs = [
+            ServiceSpec(
+                name=s['name'],
+                endpoint=s['endpoint'],
+                auth_required=bool(s.get('auth_required'))
             )
+            for s in services
+        ]
+        self.slow_threshold = slow_threshold
+        # Results buffer with one slot per service, reused across sweeps
+        self.results: List[Optional[ServiceHealth]] = [None] * len(self._service_specs)
+        
+        # Shared Key Vault client, None if not configured
+        self.key_vault_client = _get_secret_client()
+        
+        # API keys cached as secret name -> (expires_at, value); a None value
+        # marks a failed lookup that is retried after the shorter negative TTL
+        self._secret_cache: Dict[str, Tuple[float, Optional[str]]] = {}
+        self._secret_ttl = secret_ttl
+        self._secret_negative_ttl = secret_negative_ttl
+        
+        # Unchanged statuses are reported at most once per emit interval;
+        # service name -> (last emitted at, last emitted status)
+        self._last_emit: Dict[str, Tuple[float, str]] = {}
+        self._metric_emit_interval = metric_emit_interval
+        
+        # Shared HTTP session, opened in __aenter__ so connections are kept alive
+        # across health checks and Power BI posts
+        self._session: Optional[aiohttp.ClientSession] = None
     
-    async def check_service(self, session: aiohttp.ClientSession, service: Dict[str, str]) -> ServiceHealth:
-        """Check health of a single service"""
-        service_name = service['name']
-        endpoint = service['endpoint']
+    async def __aenter__(self) -> "HealthChecker":
+        # Resolve service hostnames asynchronously via aiodns when available
+        try:
+            resolver = aiohttp.AsyncResolver()
+        except RuntimeError:
+            logger.info("aiodns not installed, falling back to threaded DNS resolution")
+            resolver = aiohttp.ThreadedResolver()
         
-        with tracer.start_as_current_span(f"health_check_{service_name}") as span:
-            span.set_attribute("service.name", service_name)
-            span.set_attribute("service.endpoint", endpoint)
-            
-            start_time = datetime.utcnow()
+        connector = aiohttp.TCPConnector(
+            limit=100,
+            limit_per_host=10,
+            keepalive_timeout=60,
+            resolver=resolver,
+            use_dns_cache=True,
+            ttl_dns_cache=300,
+            family=socket.AF_INET
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector,
+            json_serialize=lambda obj: orjson.dumps(obj).decode()
+        )
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._session:
+            await self._session.close()
+            self._session = None
+    
+    async def _get_api_key(self, service_name: str) -> Optional[str]:
+        """Get a service API key from Key Vault, cached for the secret TTL"""
+        secret_name = f"{service_name}-api-key"
+        now = time.monotonic()
+        
+        cached = self._secret_cache.get(secret_name)
+        if cached and cached[0] > now:
+            return cached[1]
+        
+        try:
+            secret = await self.key_vault_client.get_secret(secret_name)
+            self._secret_cache[secret_name] = (now + self._secret_ttl, secret.value)
+            return secret.value
+        except ResourceNotFoundError:
+            logger.warning(f"API key {secret_name} not found in Key Vault")
+        except Exception as e:
+            logger.warning(f"Failed to get API key for {service_name}: {e}")
+        
+        self._secret_cache[secret_name] = (now + self._secret_negative_ttl, None)
+        return None
+    
+    async def check_service(self, spec: ServiceSpec, index: Optional[int] = None) -> ServiceHealth:
+        """Check health of a single service, storing the result at index if given"""
+        service_name = spec.name
+        endpoint = spec.endpoint
+        
+        start_time_ns = time.time_ns()
+        start_time = time.monotonic()
+        error: Optional[Exception] = None
+        
+        try:
+            # Add authentication header if needed
+            headers = _NO_HEADERS
+            if self.key_vault_client and spec.auth_required:
+                api_key = await self._get_api_key(service_name)
+                if api_key:
+                    headers = {'Authorization': f"Bearer {api_key}"}
             
-            try:
-                # Add authentication header if needed
-                headers = {}
-                if self.key_vault_client and service.get('auth_required'):
+            async with self._session.get(
+                endpoint,
+                headers=headers,
+                timeout=self._client_timeout
+            ) as response:
+                response_time = time.monotonic() - start_time
+                
+                # Check if response is healthy
+                if response.status == 200:
+                    raw = await response.read()
                     try:
-                        api_key = self.key_vault_client.get_secret(f"{service_name}-api-key").value
-                        headers['Authorization'] = f"Bearer {api_key}"
-                    except Exception as e:
-                        logger.warning(f"Failed to get API key for {service_name}: {e}")
+                        health_data = orjson.loads(raw) if raw else {}
+                        status = health_data.get('status', 'healthy') if isinstance(health_data, dict) else 'healthy'
+                    except orjson.JSONDecodeError:
+                        status = 'healthy'
+                else:
+                    status = 'unhealthy'
                 
-                async with session.get(
-                    endpoint,
-                    headers=headers,
-                    timeout=aiohttp.ClientTimeout(total=self.timeout)
-                ) as response:
-                    response_time = (datetime.utcnow() - start_time).total_seconds()
-                    
-                    # Check if response is healthy
-                    if response.status == 200:
-                        try:
-                            health_data = await response.json()
-                            status = health_data.get('status', 'healthy')
-                        except:
-                            status = 'healthy'
-                    else:
-                        status = 'unhealthy'
-                    
-                    result = ServiceHealth(
-                        service_name=service_name,
-                        endpoint=endpoint,
-                        status=status,
-                        response_time=response_time,
-                        status_code=response.status
-                    )
-                    
-                    span.set_attribute("health.status", status)
-                    span.set_attribute("http.status_code", response.status)
-                    
-            except asyncio.TimeoutError:
-                response_time = self.timeout
                 result = ServiceHealth(
                     service_name=service_name,
                     endpoint=endpoint,
-                    status='timeout',
+                    status=status,
                     response_time=response_time,
-                    error_message=f"Request timed out after {self.timeout}s"
+                    status_code=response.status
                 )
-                span.set_attribute("health.status", "timeout")
                 
-            except Exception as e:
-                response_time = (datetime.utcnow() - start_time).total_seconds()
-                result = ServiceHealth(
-                    service_name=service_name,
-                    endpoint=endpoint,
-                    status='error',
-                    response_time=response_time,
-                    error_message=str(e)
-                )
-                span.set_attribute("health.status", "error")
-                span.record_exception(e)
-                logger.error(f"Error checking {service_name}: {e}")
-            
-            # Record metrics
-            health_check_counter.add(1, {"service": service_name, "status": result.status})
-            health_check_duration.record(response_time, {"service": service_name})
-            service_health_gauge.set(
-                1 if result.status == 'healthy' else 0,
-                {"service": service_name}
+        except asyncio.CancelledError:
+            # Cancelled by a fail-fast sweep or loop shutdown; not a service error
+            raise
+        
+        except asyncio.TimeoutError:
+            response_time = self.timeout
+            result = ServiceHealth(
+                service_name=service_name,
+                endpoint=endpoint,
+                status='timeout',
+                response_time=response_time,
+                error_message=f"Request timed out after {self.timeout}s"
             )
             
-            return result
+        except Exception as e:
+            response_time = time.monotonic() - start_time
+            error = e
+            result = ServiceHealth(
+                service_name=service_name,
+                endpoint=endpoint,
+                status='error',
+                response_time=response_time,
+                error_message=str(e)
+            )
+            logger.error(f"Error checking {service_name}: {e}")
+        
+        # Only trace checks worth investigating; healthy fast checks are
+        # already covered by the metrics below
+        if result.status != 'healthy' or response_time > self.slow_threshold:
+            self._record_span(result, start_time_ns, error)
+        
+        # Record metrics; per-service latency is available from the traced
+        # slow/failing checks, so the histogram is only split by status.
+        # Status changes are always emitted, steady statuses are downsampled
+        now = time.monotonic()
+        last = self._last_emit.get(service_name)
+        if last is None or result.status != last[1] or now - last[0] >= self._metric_emit_interval:
+            self._last_emit[service_name] = (now, result.status)
+            health_check_counter.add(1, {"service": service_name, "status": result.status})
+            health_check_duration.record(response_time, {"status": result.status})
+        
+        _latest_health[service_name] = 1 if result.status == 'healthy' else 0
+        
+        if index is not None:
+            self.results[index] = result
+        return result
     
-    async def check_all_services(self) -> List[ServiceHealth]:
-        """Check health of all configured services"""
-        async with aiohttp.ClientSession() as session:
-            tasks = [self.check_service(session, service) for service in self.services]
-            self.results = await asyncio.gather(*tasks)
+    def _record_span(self, result: ServiceHealth, start_time_ns: int, error: Optional[Exception] = None):
+        """Record a span for a failed or slow health check after the fact"""
+        span = tracer.start_span(f"health_check_{result.service_name}", start_time=start_time_ns)
+        span.set_attribute("service.name", result.service_name)
+        span.set_attribute("service.endpoint", result.endpoint)
+        span.set_attribute("health.status", result.status)
+        if result.status_code is not None:
+            span.set_attribute("http.status_code", result.status_code)
+        if error is not None:
+            span.record_exception(error)
+        span.end(end_time=start_time_ns + int(result.response_time * 1e9))
+    
+    async def check_all_services(self, fail_fast: bool = False) -> List[Optional[ServiceHealth]]:
+        """Check health of all configured services
+        
+        With fail_fast, remaining checks are cancelled as soon as one service
+        is not healthy and their result slots are left as None.
+        """
+        for i in range(len(self.results)):
+            self.results[i] = None
+        
+        tasks = [
+            asyncio.create_task(self.check_service(spec, i))
+            for i, spec in enumerate(self._service_specs)
+        ]
+        if not fail_fast:
+            await asyncio.gather(*tasks)
             return self.results
+        
+        for next_result in asyncio.as_completed(tasks):
+            result = await next_result
+            if result.status != 'healthy':
+                break
+        
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return self.results
     
     def get_summary(self) -> Dict:
-        """Get summary of health check results"""
-        total = len(self.results)
-        healthy = sum(1 for r in self.results if r.status == 'healthy')
-        unhealthy = sum(1 for r in self.results if r.status == 'unhealthy')
-        timeout = sum(1 for r in self.results if r.status == 'timeout')
-        error = sum(1 for r in self.results if r.status == 'error')
+        """Get summary of health check results
+        
+        Totals cover every configured service; checks cancelled by a
+        fail-fast sweep are listed as cancelled rather than left out.
+        """
+        total = len(self._service_specs)
+        checked = 0
+        counts = Counter()
+        total_response_time = 0.0
+        cancelled_services = []
+        for spec, r in zip(self._service_specs, self.results):
+            if r is None:
+                cancelled_services.append(spec.name)
+                continue
+            checked += 1
+            counts[r.status] += 1
+            total_response_time += r.response_time
         
-        avg_response_time = sum(r.response_time for r in self.results) / total if total > 0 else 0
+        healthy = counts['healthy']
+        avg_response_time = total_response_time / checked if checked > 0 else 0
         
         return {
-            'timestamp': datetime.utcnow().isoformat(),
+            'timestamp': datetime.now(timezone.utc).isoformat(),
             'total_services': total,
             'healthy': healthy,
-            'unhealthy': unhealthy,
-            'timeout': timeout,
-            'error': error,
+            'unhealthy': counts['unhealthy'],
+            'timeout': counts['timeout'],
+            'error': counts['error'],
+            'cancelled': len(cancelled_services),
+            'cancelled_services': cancelled_services,
             'health_percentage': (healthy / total * 100) if total > 0 else 0,
             'average_response_time': avg_response_time,
-            'results': [asdict(r) for r in self.results]
+            'results': [asdict(r) for r in self.results if r is not None]
         }
     
     async def send_to_power_bi(self, summary: Dict):
@@ -210,28 +407,29 @@ class HealthChecker:
             logger.info("Power BI streaming URL not configured")
             return
         
-        async with aiohttp.ClientSession() as session:
-            for result in self.results:
-                payload = [{
-                    'timestamp': result.timestamp,
-                    'serviceName': result.service_name,
-                    'responseTime': result.response_time * 1000,  # Convert to ms
-                    'errorRate': 0.0 if result.status == 'healthy' else 100.0,
-                    'requestsPerSecond': 0.0,  # Would be calculated from actual metrics
-                    'cpuUsage': 0.0,  # Would come from container metrics
-                    'memoryUsage': 0.0,  # Would come from container metrics
-                    'podCount': 1,  # Would come from K8s API
-                    'healthStatus': 'Healthy' if result.status == 'healthy' else 'Unhealthy'
-                }]
-                
-                try:
-                    async with session.post(power_bi_url, json=payload) as response:
-                        if response.status != 200:
-                            logger.error(f"Failed to send to Power BI: {response.status}")
-                except Exception as e:
-                    logger.error(f"Error sending to Power BI: {e}")
+        rows = [{
+            'timestamp': result.timestamp,
+            'serviceName': result.service_name,
+            'responseTime': result.response_time * 1000,  # Convert to ms
+            'errorRate': 0.0 if result.status == 'healthy' else 100.0,
+            'requestsPerSecond': 0.0,  # Would be calculated from actual metrics
+            'cpuUsage': 0.0,  # Would come from container metrics
+            'memoryUsage': 0.0,  # Would come from container metrics
+            'podCount': 1,  # Would come from K8s API
+            'healthStatus': 'Healthy' if result.status == 'healthy' else 'Unhealthy'
+        } for result in self.results if result is not None]
+        
+        # Streaming datasets accept arrays of rows, so send them in batches
+        for i in range(0, len(rows), POWER_BI_BATCH_SIZE):
+            payload = rows[i:i + POWER_BI_BATCH_SIZE]
+            try:
+                async with self._session.post(power_bi_url, json=payload) as response:
+                    if response.status != 200:
+                        logger.error(f"Failed to send to Power BI: {response.status}")
+            except Exception as e:
+                logger.error(f"Error sending to Power BI: {e}")
 
-async def main():
+async def main(fail_fast: bool = False):
     """Main function"""
     # Load service configuration
     services = [
@@ -263,28 +461,48 @@ async def main():
     ]
     
     # Create health checker
-    checker = HealthChecker(services)
-    
-    # Run health checks
-    logger.info("Starting health checks...")
-    await checker.check_all_services()
-    
-    # Get summary
-    summary = checker.get_summary()
-    
-    # Print results
-    print(json.dumps(summary, indent=2))
+    async with HealthChecker(services) as checker:
+        # Run health checks
+        logger.info("Starting health checks...")
+        await checker.check_all_services(fail_fast=fail_fast)
+        
+        # Get summary
+        summary = checker.get_summary()
+        
+        # Print results
+        print(orjson.dumps(summary, option=orjson.OPT_INDENT_2).decode())
+        
+        # The same signals already reach Azure Monitor through OpenTelemetry and
+        # can feed Power BI from there; direct push is opt-in and only sends
+        # sweeps that contain unhealthy services. Fail-fast sweeps are partial
+        # and are never pushed
+        if POWER_BI_DIRECT_PUSH and not fail_fast and summary['healthy'] != summary['total_services']:
+            await checker.send_to_power_bi(summary)
     
-    # Send to Power BI
-    await checker.send_to_power_bi(summary)
+    await close_azure_clients()
     
     # Exit with appropriate code
     if summary['healthy'] == summary['total_services']:
         logger.info("All services are healthy")
         sys.exit(0)
     else:
-        logger.warning(f"Some services are unhealthy: {summary['unhealthy']} unhealthy, {summary['timeout']} timeout, {summary['error']} error")
+        logger.warning(f"Some services are unhealthy: {summary['unhealthy']} unhealthy, {summary['timeout']} timeout, {summary['error']} error, {summary['cancelled']} not checked")
         sys.exit(1)
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Check health of e-commerce platform services")
+    parser.add_argument(
+        '--fail-fast',
+        action='store_true',
+        help="Stop checking as soon as one service is not healthy"
+    )
+    args = parser.parse_args()
+    
+    # Use uvloop where available (Linux containers); fall back to the default loop
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+    
+    asyncio.run(main(fail_fast=args.fail_fast))
\ No newline at end of file
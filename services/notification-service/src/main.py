@@ -3,17 +3,22 @@
 # Following PRP patterns from /examples/scripts/health-check.py for async patterns
 
 import asyncio
-import json
+import itertools
 import logging
 import os
 import signal
+import string
 import sys
+import time
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Awaitable, Callable, List, Mapping, Optional, Tuple, Union
 import uuid
-import smtplib
-from email.mime.text import MimeText
-from email.mime.multipart import MimeMultipart
+from email.message import EmailMessage
+from email.policy import SMTP as SMTP_POLICY
+
+# Async SMTP client so email sends don't block the event loop
+import aiosmtplib
 
 # Azure imports
 from azure.eventhub.aio import EventHubConsumerClient
@@ -24,11 +29,11 @@ from azure.keyvault.secrets.aio import SecretClient
 
 # FastAPI for health endpoints
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 import uvicorn
 
 # Pydantic models
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field, ValidationInfo, field_validator
 from dataclasses import dataclass
 from enum import Enum
 
@@ -39,6 +44,67 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@dataclass(slots=True, frozen=True)
+class Settings:
+    """Service configuration, read from the environment once at startup"""
+    environment: str
+    reload: bool
+    port: int
+    key_vault_url: Optional[str]
+    smtp_server: str
+    smtp_port: int
+    smtp_username: str
+    smtp_password: str
+    smtp_use_tls: bool
+    smtp_pool_size: int
+    smtp_timeout: float
+    event_hub_connection_string: Optional[str]
+    event_hub_name: str
+    consumer_group: str
+    event_hub_max_batch_size: int
+    event_hub_checkpoint_events: int
+    event_hub_checkpoint_interval: float
+    service_bus_connection_string: Optional[str]
+    service_bus_max_message_count: int
+    notification_queue_size: int
+    notification_workers: int
+    email_batch_max: int
+    dedup_cache_size: int
+    secret_cache_ttl: int
+    
+    @classmethod
+    def from_env(cls) -> "Settings":
+        env = os.environ
+        smtp_pool_size = int(env.get('SMTP_POOL_SIZE', '4'))
+        return cls(
+            environment=env.get('ENVIRONMENT', 'dev'),
+            reload=env.get('ENVIRONMENT') == 'dev',
+            port=int(env.get('PORT', '8003')),
+            key_vault_url=env.get('KEY_VAULT_URL'),
+            smtp_server=env.get('SMTP_SERVER', 'smtp.gmail.com'),
+            smtp_port=int(env.get('SMTP_PORT', '587')),
+            smtp_username=env.get('SMTP_USERNAME', ''),
+            smtp_password=env.get('SMTP_PASSWORD', ''),
+            smtp_use_tls=env.get('SMTP_USE_TLS', 'true').lower() == 'true',
+            smtp_pool_size=smtp_pool_size,
+            smtp_timeout=float(env.get('SMTP_TIMEOUT', '30')),
+            event_hub_connection_string=env.get('EVENT_HUB_CONNECTION_STRING'),
+            event_hub_name=env.get('EVENT_HUB_NAME', 'system-events'),
+            consumer_group=env.get('CONSUMER_GROUP', 'notification-service'),
+            event_hub_max_batch_size=int(env.get('EVENT_HUB_MAX_BATCH_SIZE', '100')),
+            event_hub_checkpoint_events=int(env.get('EVENT_HUB_CHECKPOINT_EVENTS', '500')),
+            event_hub_checkpoint_interval=float(env.get('EVENT_HUB_CHECKPOINT_INTERVAL', '10')),
+            service_bus_connection_string=env.get('SERVICE_BUS_CONNECTION_STRING'),
+            service_bus_max_message_count=int(env.get('SERVICE_BUS_MAX_MESSAGE_COUNT', '50')),
+            notification_queue_size=int(env.get('NOTIFICATION_QUEUE_SIZE', '1000')),
+            notification_workers=int(env.get('NOTIFICATION_WORKERS', str(smtp_pool_size))),
+            email_batch_max=int(env.get('EMAIL_BATCH_MAX', '50')),
+            dedup_cache_size=int(env.get('NOTIFICATION_DEDUP_CACHE_SIZE', '100000')),
+            secret_cache_ttl=int(env.get('SECRET_CACHE_TTL', '300'))
+        )
+
+SETTINGS = Settings.from_env()
+
 class NotificationType(Enum):
     EMAIL = "email"
     SMS = "sms"
@@ -54,7 +120,83 @@ class NotificationTemplate(Enum):
     PAYMENT_FAILED = "payment_failed"
     REFUND_PROCESSED = "refund_processed"
 
-@dataclass
+# Acknowledgement callback awaited with whether a queued notification was sent
+Ack = Callable[[bool], Awaitable[None]]
+
+def compile_template(template: str) -> Callable[[Mapping[str, Any]], str]:
+    """Pre-parse a str.format template into a renderer taking a data mapping"""
+    tokens = [
+        (literal, field_name)
+        for literal, field_name, _, _ in string.Formatter().parse(template)
+    ]
+    
+    def render(data: Mapping[str, Any]) -> str:
+        return ''.join(
+            literal + str(data[field_name]) if field_name is not None else literal
+            for literal, field_name in tokens
+        )
+    
+    return render
+
+# Notification templates by order event type; status changes are resolved
+# through the new order status instead
+_EVENT_TEMPLATE_MAP: Dict[str, NotificationTemplate] = {
+    'order.created': NotificationTemplate.ORDER_CREATED,
+    'order.cancelled': NotificationTemplate.ORDER_CANCELLED,
+}
+
+_STATUS_TEMPLATE_MAP: Dict[str, NotificationTemplate] = {
+    'shipped': NotificationTemplate.ORDER_SHIPPED,
+    'delivered': NotificationTemplate.ORDER_DELIVERED,
+    'cancelled': NotificationTemplate.ORDER_CANCELLED,
+}
+
+class EventPayload(BaseModel):
+    """Base for event payloads published by other services
+    
+    Numeric identifiers are rendered as strings and explicit nulls fall back
+    to the field defaults, as publishers may send either.
+    """
+    model_config = ConfigDict(coerce_numbers_to_str=True)
+    
+    @field_validator('*', mode='before')
+    @classmethod
+    def _null_to_default(cls, value: Any, info: ValidationInfo) -> Any:
+        if value is None:
+            return cls.model_fields[info.field_name].get_default(call_default_factory=True)
+        return value
+
+class OrderEventData(EventPayload):
+    """Order event payload published by the order service"""
+    customer_id: Optional[str] = Field('', alias='customerId')
+    customer_email: Optional[str] = Field('', alias='customerEmail')
+    customer_name: Optional[str] = Field('Valued Customer', alias='customerName')
+    order_number: Optional[str] = Field('N/A', alias='orderNumber')
+    total_amount: Optional[Union[int, float]] = Field(0, alias='totalAmount')
+    currency: Optional[str] = 'USD'
+    item_count: Optional[int] = Field(0, alias='itemCount')
+    tracking_number: Optional[str] = Field('', alias='trackingNumber')
+    estimated_delivery: Optional[str] = Field('', alias='estimatedDelivery')
+    new_status: Optional[str] = Field(None, alias='newStatus')
+
+# Payload fields that are not used as email template fields
+_ORDER_NON_TEMPLATE_FIELDS = {'customer_id', 'customer_email', 'new_status'}
+
+class OrderEventMessage(EventPayload):
+    """Service Bus order event envelope"""
+    event_type: Optional[str] = Field('', alias='eventType')
+    data: Optional[OrderEventData] = Field(default_factory=OrderEventData)
+
+class PaymentEventMessage(EventPayload):
+    """Event Hub payment event published by the payment service"""
+    event_type: str = ''
+    status: Optional[str] = None
+    customer_id: Optional[str] = ''
+    customer_email: Optional[str] = ''
+    order_id: Optional[str] = 'N/A'
+    error_message: Optional[str] = 'Payment processing failed'
+
+@dataclass(slots=True)
 class NotificationEvent:
     id: str
     event_type: str
@@ -64,6 +206,7 @@ class NotificationEvent:
     data: Dict[str, Any]
     timestamp: datetime
     priority: int = 1  # 1=high, 2=medium, 3=low
+    source_id: Optional[str] = None  # id of the message or event it came from
 
 class NotificationService:
     def __init__(self):
@@ -74,6 +217,40 @@ class NotificationService:
         self.smtp_config: Dict[str, Any] = {}
         self.running = True
         
+        # Key Vault secret values as name -> (expires_at, value)
+        self._secret_cache: Dict[str, Tuple[float, str]] = {}
+        self._secret_ttl = SETTINGS.secret_cache_ttl
+        
+        # Pool of connected, logged-in SMTP clients reused across sends
+        self._smtp_pool: Optional[asyncio.Queue] = None
+        self._smtp_pool_size = SETTINGS.smtp_pool_size
+        self._smtp_keepalive_task: Optional[asyncio.Task] = None
+        
+        # Bounded queue between the receivers and the email workers; receivers
+        # block on a full queue, which stops them pulling more events. Entries
+        # are (priority, seq, notification, ack) so high-priority notifications
+        # jump the backlog and equal priorities stay FIFO
+        self._work_q: asyncio.PriorityQueue = asyncio.PriorityQueue(
+            maxsize=SETTINGS.notification_queue_size
+        )
+        self._work_seq = itertools.count()
+        self._worker_count = SETTINGS.notification_workers
+        self._worker_tasks: List[asyncio.Task] = []
+        self._batch_max = SETTINGS.email_batch_max
+        
+        # Source message ids of notifications queued or sent, oldest first, to
+        # absorb Event Hub / Service Bus redeliveries. Ids are marked when
+        # queued and forgotten again if the send fails, so a redelivery
+        # arriving while the original is in flight is skipped too
+        self._seen: OrderedDict[str, float] = OrderedDict()
+        self._seen_max = SETTINGS.dedup_cache_size
+        
+        # Event Hub checkpoints per partition as
+        # partition id -> (context, latest unsaved event, events since checkpoint, last checkpoint time)
+        self._checkpoint_state: Dict[str, Tuple[Any, Optional[EventData], int, float]] = {}
+        self._checkpoint_every = SETTINGS.event_hub_checkpoint_events
+        self._checkpoint_interval = SETTINGS.event_hub_checkpoint_interval
+        
         # Email templates
         self.email_templates = {
             NotificationTemplate.ORDER_CREATED: {
@@ -116,25 +293,37 @@ class NotificationService:
             }
         }
     
+        # Templates parsed once into (subject, body) renderers
+        self._compiled_templates = {
+            template: (compile_template(config['subject']), compile_template(config['template']))
+            for template, config in self.email_templates.items()
+        }
+    
     async def initialize(self):
         """Initialize Azure services and configurations"""
         try:
             logger.info("Initializing Notification Service...")
             
             # Initialize Key Vault client
-            key_vault_url = os.environ.get('KEY_VAULT_URL')
+            key_vault_url = SETTINGS.key_vault_url
             if key_vault_url:
                 self.key_vault_client = SecretClient(vault_url=key_vault_url, credential=self.credential)
                 logger.info("Key Vault client initialized")
             
-            # Initialize SMTP configuration
-            await self._load_smtp_config()
-            
-            # Initialize Event Hub consumer client
-            await self._initialize_eventhub()
+            # Load SMTP configuration and initialize the Event Hub consumer and
+            # Service Bus clients concurrently, so their Key Vault lookups overlap
+            await asyncio.gather(
+                self._load_smtp_config(),
+                self._initialize_eventhub(),
+                self._initialize_servicebus()
+            )
             
-            # Initialize Service Bus client for order events
-            await self._initialize_servicebus()
+            # Initialize SMTP connection pool and email workers
+            await self._initialize_smtp_pool()
+            self._worker_tasks = [
+                asyncio.create_task(self._notification_worker())
+                for _ in range(self._worker_count)
+            ]
             
             logger.info("Notification Service initialized successfully")
             
@@ -142,30 +331,42 @@ class NotificationService:
             logger.error(f"Failed to initialize Notification Service: {e}")
             raise
 
+    async def _get_secret(self, name: str) -> str:
+        """Get a Key Vault secret value, cached for the secret TTL"""
+        cached = self._secret_cache.get(name)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        
+        secret = await self.key_vault_client.get_secret(name)
+        self._secret_cache[name] = (time.monotonic() + self._secret_ttl, secret.value)
+        return secret.value
+
     async def _load_smtp_config(self):
         """Load SMTP configuration from Key Vault or environment"""
         try:
             if self.key_vault_client:
                 # Try to get SMTP configuration from Key Vault
-                smtp_password_secret = await self.key_vault_client.get_secret('smtp-password')
-                smtp_username_secret = await self.key_vault_client.get_secret('smtp-username')
+                smtp_password, smtp_username = await asyncio.gather(
+                    self._get_secret('smtp-password'),
+                    self._get_secret('smtp-username')
+                )
                 
                 self.smtp_config = {
-                    'server': os.environ.get('SMTP_SERVER', 'smtp.gmail.com'),
-                    'port': int(os.environ.get('SMTP_PORT', '587')),
-                    'username': smtp_username_secret.value,
-                    'password': smtp_password_secret.value,
-                    'use_tls': os.environ.get('SMTP_USE_TLS', 'true').lower() == 'true'
+                    'server': SETTINGS.smtp_server,
+                    'port': SETTINGS.smtp_port,
+                    'username': smtp_username,
+                    'password': smtp_password,
+                    'use_tls': SETTINGS.smtp_use_tls
                 }
                 logger.info("SMTP configuration loaded from Key Vault")
             else:
                 # Fallback to environment variables
                 self.smtp_config = {
-                    'server': os.environ.get('SMTP_SERVER', 'smtp.gmail.com'),
-                    'port': int(os.environ.get('SMTP_PORT', '587')),
-                    'username': os.environ.get('SMTP_USERNAME', ''),
-                    'password': os.environ.get('SMTP_PASSWORD', ''),
-                    'use_tls': os.environ.get('SMTP_USE_TLS', 'true').lower() == 'true'
+                    'server': SETTINGS.smtp_server,
+                    'port': SETTINGS.smtp_port,
+                    'username': SETTINGS.smtp_username,
+                    'password': SETTINGS.smtp_password,
+                    'use_tls': SETTINGS.smtp_use_tls
                 }
                 logger.info("SMTP configuration loaded from environment variables")
                 
@@ -180,19 +381,74 @@ class NotificationService:
                 'use_tls': True
             }
 
+    async def _initialize_smtp_pool(self):
+        """Open the pool of persistent SMTP connections"""
+        if self.smtp_config['server'] == 'mock':
+            return
+        
+        self._smtp_pool = asyncio.Queue()
+        
+        clients = [
+            aiosmtplib.SMTP(
+                hostname=self.smtp_config['server'],
+                port=self.smtp_config['port'],
+                use_tls=False,
+                start_tls=self.smtp_config['use_tls'],
+                # Bound every SMTP command so a stalled server can't hold a worker
+                timeout=SETTINGS.smtp_timeout
+            )
+            for _ in range(self._smtp_pool_size)
+        ]
+        
+        # Connections that fail here are retried when the client is checked out
+        results = await asyncio.gather(*(self._connect_smtp(smtp) for smtp in clients), return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.warning(f"Failed to open SMTP connection: {result}")
+        
+        for smtp in clients:
+            self._smtp_pool.put_nowait(smtp)
+        
+        self._smtp_keepalive_task = asyncio.create_task(self._smtp_keepalive())
+        logger.info(f"SMTP connection pool initialized with {self._smtp_pool_size} connections")
+
+    async def _connect_smtp(self, smtp: aiosmtplib.SMTP):
+        """(Re)connect and log in a pooled SMTP client"""
+        if smtp.is_connected:
+            smtp.close()
+        await smtp.connect()
+        await smtp.login(self.smtp_config['username'], self.smtp_config['password'])
+
+    async def _smtp_keepalive(self, interval: int = 30):
+        """Send NOOP on idle pooled connections so servers don't drop them"""
+        while self.running:
+            await asyncio.sleep(interval)
+            for _ in range(self._smtp_pool.qsize()):
+                try:
+                    smtp = self._smtp_pool.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                try:
+                    if smtp.is_connected:
+                        await smtp.noop()
+                except aiosmtplib.SMTPException as e:
+                    logger.debug(f"SMTP keepalive failed, reconnecting on next use: {e}")
+                    smtp.close()
+                finally:
+                    self._smtp_pool.put_nowait(smtp)
+
     async def _initialize_eventhub(self):
         """Initialize Event Hub consumer client"""
         try:
             # Get Event Hub connection string
-            connection_string = os.environ.get('EVENT_HUB_CONNECTION_STRING')
+            connection_string = SETTINGS.event_hub_connection_string
             
             if not connection_string and self.key_vault_client:
-                secret = await self.key_vault_client.get_secret('eventhub-connection-string')
-                connection_string = secret.value
+                connection_string = await self._get_secret('eventhub-connection-string')
             
             if connection_string:
-                eventhub_name = os.environ.get('EVENT_HUB_NAME', 'system-events')
-                consumer_group = os.environ.get('CONSUMER_GROUP', 'notification-service')
+                eventhub_name = SETTINGS.event_hub_name
+                consumer_group = SETTINGS.consumer_group
                 
                 self.eventhub_client = EventHubConsumerClient.from_connection_string(
                     connection_string,
@@ -210,11 +466,10 @@ class NotificationService:
         """Initialize Service Bus client for order events"""
         try:
             # Get Service Bus connection string
-            connection_string = os.environ.get('SERVICE_BUS_CONNECTION_STRING')
+            connection_string = SETTINGS.service_bus_connection_string
             
             if not connection_string and self.key_vault_client:
-                secret = await self.key_vault_client.get_secret('servicebus-connection-string')
-                connection_string = secret.value
+                connection_string = await self._get_secret('servicebus-connection-string')
             
             if connection_string:
                 self.servicebus_client = ServiceBusClient.from_connection_string(connection_string)
@@ -227,134 +482,216 @@ class NotificationService:
 
     async def send_email_notification(self, notification: NotificationEvent) -> bool:
         """Send email notification"""
+        results = await self._send_batch([notification])
+        return results[0]
+
+    async def enqueue_notification(self, notification: NotificationEvent, ack: Ack):
+        """Queue a notification for the email workers
+        
+        ack is awaited with the send outcome once the notification has been
+        processed; this blocks while the queue is full.
+        """
+        # Templates without email content have nothing to send
+        if notification.template not in self._compiled_templates:
+            logger.warning(f"No email template found for {notification.template}")
+            await ack(True)
+            return
+        
+        # Redelivered messages whose notification is already queued or sent
+        # are acknowledged without sending it again
+        source_id = notification.source_id
+        if source_id is not None:
+            if source_id in self._seen:
+                logger.info(f"Skipping duplicate {notification.template.value} notification for message {source_id}")
+                await ack(True)
+                return
+            self._mark_seen(source_id)
+        
         try:
-            if self.smtp_config['server'] == 'mock':
-                # Mock email sending for testing
-                logger.info(f"MOCK: Sending email to {notification.customer_email} - {notification.template.value}")
-                return True
-            
-            # Get email template
-            template_config = self.email_templates.get(notification.template)
-            if not template_config:
-                logger.warning(f"No email template found for {notification.template}")
-                return False
-            
-            # Format subject and body
-            subject = template_config['subject'].format(**notification.data)
-            body = template_config['template'].format(**notification.data)
-            
-            # Create email message
-            msg = MimeMultipart('alternative')
-            msg['Subject'] = subject
-            msg['From'] = self.smtp_config['username']
-            msg['To'] = notification.customer_email
-            
-            # Add HTML content
-            html_part = MimeText(body, 'html')
-            msg.attach(html_part)
-            
-            # Send email
-            with smtplib.SMTP(self.smtp_config['server'], self.smtp_config['port']) as server:
-                if self.smtp_config['use_tls']:
-                    server.starttls()
-                server.login(self.smtp_config['username'], self.smtp_config['password'])
-                server.send_message(msg)
+            await self._work_q.put((notification.priority, next(self._work_seq), notification, ack))
+        except BaseException:
+            self._forget_seen(source_id)
+            raise
+
+    def _mark_seen(self, source_id: str):
+        """Record a queued source message, evicting the oldest beyond the cache size"""
+        self._seen[source_id] = time.monotonic()
+        self._seen.move_to_end(source_id)
+        if len(self._seen) > self._seen_max:
+            self._seen.popitem(last=False)
+
+    def _forget_seen(self, source_id: Optional[str]):
+        """Allow a redelivery of a source message whose notification failed"""
+        if source_id is not None:
+            self._seen.pop(source_id, None)
+
+    def _build_email(self, notification: NotificationEvent) -> Optional[bytes]:
+        """Render the RFC 5322 message for a notification
+        
+        The SMTP policy encodes non-ASCII headers and rejects header values
+        containing CR or LF, which would otherwise let event fields inject
+        headers. The body is quoted-printable so its lines stay 7-bit and
+        within SMTP's length limit.
+        """
+        # Get email template
+        renderers = self._compiled_templates.get(notification.template)
+        if not renderers:
+            logger.warning(f"No email template found for {notification.template}")
+            return None
+        
+        # Format subject and body
+        render_subject, render_body = renderers
+        subject = render_subject(notification.data)
+        body = render_body(notification.data)
+        
+        message = EmailMessage(policy=SMTP_POLICY)
+        message['From'] = self.smtp_config['username']
+        message['To'] = notification.customer_email
+        message['Subject'] = subject
+        message.set_content(body, subtype='html', cte='quoted-printable')
+        return message.as_bytes()
+
+    async def _notification_worker(self):
+        """Send queued notifications, draining up to a batch per SMTP session"""
+        while True:
+            batch = [await self._work_q.get()]
+            while len(batch) < self._batch_max:
+                try:
+                    batch.append(self._work_q.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
             
-            logger.info(f"Email sent successfully to {notification.customer_email}")
-            return True
+            try:
+                results = await self._send_batch([notification for _, _, notification, _ in batch])
+            except Exception as e:
+                logger.error(f"Failed to send notification batch: {e}")
+                results = [False] * len(batch)
             
-        except Exception as e:
-            logger.error(f"Failed to send email notification: {e}")
-            return False
+            for (_, _, notification, ack), success in zip(batch, results):
+                order_number = notification.data.get('order_number')
+                if success:
+                    logger.info(f"Notification sent for {notification.event_type} - Order {order_number}")
+                else:
+                    self._forget_seen(notification.source_id)
+                    logger.error(f"Failed to send notification for {notification.event_type} - Order {order_number}")
+                
+                try:
+                    await ack(success)
+                except Exception as e:
+                    logger.error(f"Failed to acknowledge notification {notification.id}: {e}")
+                finally:
+                    self._work_q.task_done()
+
+    async def _send_batch(self, notifications: List[NotificationEvent]) -> List[bool]:
+        """Send a batch of notifications, returning whether each one was sent"""
+        if self.smtp_config['server'] == 'mock':
+            for notification in notifications:
+                # Mock email sending for testing
+                logger.info(f"MOCK: Sending email to {notification.customer_email} - {notification.template.value}")
+            return [True] * len(notifications)
+        
+        # Send the whole batch over one pooled connection, reconnecting once
+        # per message if the server has dropped it
+        results = []
+        sender = self.smtp_config['username']
+        smtp = await self._smtp_pool.get()
+        try:
+            for notification in notifications:
+                try:
+                    message = self._build_email(notification)
+                    if message is None:
+                        results.append(False)
+                        continue
+                    
+                    if not smtp.is_connected:
+                        await self._connect_smtp(smtp)
+                    try:
+                        await smtp.sendmail(sender, [notification.customer_email], message)
+                    except aiosmtplib.SMTPServerDisconnected:
+                        await self._connect_smtp(smtp)
+                        await smtp.sendmail(sender, [notification.customer_email], message)
+                    
+                    logger.info(f"Email sent successfully to {notification.customer_email}")
+                    results.append(True)
+                    
+                except Exception as e:
+                    logger.error(f"Failed to send email notification: {e}")
+                    results.append(False)
+        finally:
+            self._smtp_pool.put_nowait(smtp)
+        
+        return results
 
-    async def process_order_event(self, event_data: Dict[str, Any]):
+    async def process_order_event(self, event: OrderEventMessage, ack: Ack, source_id: Optional[str] = None):
         """Process order-related events"""
         try:
-            event_type = event_data.get('eventType', '')
-            data = event_data.get('data', {})
+            event_type = event.event_type
+            data = event.data
             
             # Map event types to notification templates
-            template_mapping = {
-                'order.created': NotificationTemplate.ORDER_CREATED,
-                'order.status_changed': self._get_status_template(data.get('newStatus')),
-                'order.cancelled': NotificationTemplate.ORDER_CANCELLED,
-            }
-            
-            template = template_mapping.get(event_type)
+            if event_type == 'order.status_changed':
+                template = _STATUS_TEMPLATE_MAP.get(data.new_status)
+            else:
+                template = _EVENT_TEMPLATE_MAP.get(event_type)
             if not template:
                 logger.debug(f"No notification template for event type: {event_type}")
+                await ack(True)
                 return
             
             # Create notification event
             notification = NotificationEvent(
-                id=str(uuid.uuid4()),
+                id=uuid.uuid4().hex,
                 event_type=event_type,
-                customer_id=data.get('customerId', ''),
-                customer_email=data.get('customerEmail', ''),
+                customer_id=data.customer_id,
+                customer_email=data.customer_email,
                 template=template,
-                data={
-                    'customer_name': data.get('customerName', 'Valued Customer'),
-                    'order_number': data.get('orderNumber', 'N/A'),
-                    'total_amount': data.get('totalAmount', 0),
-                    'currency': data.get('currency', 'USD'),
-                    'item_count': data.get('itemCount', 0),
-                    'tracking_number': data.get('trackingNumber', ''),
-                    'estimated_delivery': data.get('estimatedDelivery', '')
-                },
+                data=data.model_dump(exclude=_ORDER_NON_TEMPLATE_FIELDS),
                 timestamp=datetime.utcnow(),
-                priority=1 if event_type == 'order.cancelled' else 2
+                priority=1 if event_type == 'order.cancelled' else 2,
+                source_id=source_id
             )
             
-            # Send notification
-            success = await self.send_email_notification(notification)
-            
-            if success:
-                logger.info(f"Notification sent for {event_type} - Order {data.get('orderNumber')}")
-            else:
-                logger.error(f"Failed to send notification for {event_type} - Order {data.get('orderNumber')}")
+            # Queue notification for sending
+            await self.enqueue_notification(notification, ack)
                 
         except Exception as e:
             logger.error(f"Error processing order event: {e}")
+            await ack(False)
 
-    async def process_payment_event(self, event_data: Dict[str, Any]):
+    async def process_payment_event(self, event: PaymentEventMessage, ack: Ack, source_id: Optional[str] = None):
         """Process payment-related events"""
         try:
-            event_type = event_data.get('event_type', '')
+            event_type = event.event_type
             
             if event_type == 'payment.processed':
-                payment_status = event_data.get('status')
-                
-                if payment_status == 'failed':
+                if event.status == 'failed':
                     # Send payment failure notification
                     notification = NotificationEvent(
-                        id=str(uuid.uuid4()),
+                        id=uuid.uuid4().hex,
                         event_type=event_type,
-                        customer_id=event_data.get('customer_id', ''),
-                        customer_email=event_data.get('customer_email', ''),
+                        customer_id=event.customer_id,
+                        customer_email=event.customer_email,
                         template=NotificationTemplate.PAYMENT_FAILED,
                         data={
                             'customer_name': 'Valued Customer',
-                            'order_number': event_data.get('order_id', 'N/A'),
-                            'failure_reason': event_data.get('error_message', 'Payment processing failed')
+                            'order_number': event.order_id,
+                            'failure_reason': event.error_message
                         },
                         timestamp=datetime.utcnow(),
-                        priority=1  # High priority for payment failures
+                        priority=1,  # High priority for payment failures
+                        source_id=source_id
                     )
                     
-                    await self.send_email_notification(notification)
-                    logger.info(f"Payment failure notification sent for order {event_data.get('order_id')}")
+                    await self.enqueue_notification(notification, ack)
+                    logger.info(f"Payment failure notification queued for order {event.order_id}")
+                    return
+            
+            # Nothing to send for this event
+            await ack(True)
                     
         except Exception as e:
             logger.error(f"Error processing payment event: {e}")
-
-    def _get_status_template(self, status: str) -> Optional[NotificationTemplate]:
-        """Map order status to notification template"""
-        status_mapping = {
-            'shipped': NotificationTemplate.ORDER_SHIPPED,
-            'delivered': NotificationTemplate.ORDER_DELIVERED,
-            'cancelled': NotificationTemplate.ORDER_CANCELLED
-        }
-        return status_mapping.get(status)
+            await ack(False)
 
     async def start_event_processing(self):
         """Start processing events from Event Hub and Service Bus"""
@@ -370,60 +707,156 @@ class NotificationService:
 
     async def _process_eventhub_events(self):
         """Process events from Event Hub"""
-        async def on_event(partition_context, event):
+        async def handle_event(partition_id: str, event, done: asyncio.Future):
+            async def ack(success: bool):
+                if not done.done():
+                    done.set_result(success)
+            
             try:
-                event_body = event.body_as_str()
-                event_data = json.loads(event_body)
+                # Parse and validate the payload in a single pass
+                payment_event = PaymentEventMessage.model_validate_json(b''.join(event.body))
                 
-                logger.debug(f"Received Event Hub event: {event_data.get('event_type', 'unknown')}")
+                logger.debug(f"Received Event Hub event: {payment_event.event_type or 'unknown'}")
                 
                 # Process based on event source/type
-                await self.process_payment_event(event_data)
-                
-                # Update checkpoint
-                await partition_context.update_checkpoint(event)
+                # Redeliveries after a restart keep their partition and
+                # sequence number
+                source_id = f"eventhub:{partition_id}:{event.sequence_number}"
+                await self.process_payment_event(payment_event, ack, source_id)
                 
             except Exception as e:
                 logger.error(f"Error processing Event Hub event: {e}")
+                await ack(False)
+        
+        async def on_event_batch(partition_context, events):
+            if events:
+                # Queue events in order, then wait for all of them before
+                # the partition may be checkpointed past them
+                loop = asyncio.get_running_loop()
+                done = [loop.create_future() for _ in events]
+                for event, event_done in zip(events, done):
+                    await handle_event(partition_context.partition_id, event, event_done)
+                await asyncio.gather(*done)
+            
+            # Empty batches still let a time-based checkpoint go through
+            await self._maybe_checkpoint(partition_context, events[-1] if events else None, len(events))
+        
+        # Prefetch a few batches ahead so the AMQP link stays full
+        max_batch_size = SETTINGS.event_hub_max_batch_size
         
         try:
             async with self.eventhub_client:
-                await self.eventhub_client.receive(
-                    on_event=on_event,
+                await self.eventhub_client.receive_batch(
+                    on_event_batch=on_event_batch,
+                    max_batch_size=max_batch_size,
+                    prefetch=max_batch_size * 4,
+                    max_wait_time=2,
                     starting_position="-1"  # Start from beginning
                 )
         except Exception as e:
             logger.error(f"Event Hub consumer error: {e}")
 
+    async def _maybe_checkpoint(self, partition_context, event: Optional[EventData], count: int):
+        """Checkpoint a partition every N events or T seconds, whichever comes first"""
+        partition_id = partition_context.partition_id
+        now = time.monotonic()
+        _, last_event, pending, last_checkpoint = self._checkpoint_state.get(
+            partition_id, (None, None, 0, now)
+        )
+        
+        event = event or last_event
+        pending += count
+        if event is None:
+            return
+        
+        if pending >= self._checkpoint_every or now - last_checkpoint >= self._checkpoint_interval:
+            await partition_context.update_checkpoint(event)
+            self._checkpoint_state[partition_id] = (partition_context, None, 0, now)
+        else:
+            self._checkpoint_state[partition_id] = (partition_context, event, pending, last_checkpoint)
+
+    async def _flush_checkpoints(self):
+        """Checkpoint the latest processed event of every partition"""
+        for partition_id, (partition_context, event, _, _) in list(self._checkpoint_state.items()):
+            if event is None:
+                continue
+            try:
+                await partition_context.update_checkpoint(event)
+                self._checkpoint_state[partition_id] = (partition_context, None, 0, time.monotonic())
+            except Exception as e:
+                logger.error(f"Failed to checkpoint partition {partition_id}: {e}")
+
     async def _process_servicebus_events(self):
         """Process events from Service Bus topic"""
+        async def handle_message(receiver, msg):
+            async def ack(success: bool):
+                # Complete the message once its notification is sent
+                if success:
+                    await receiver.complete_message(msg)
+                else:
+                    await receiver.dead_letter_message(
+                        msg,
+                        reason="NotificationFailed",
+                        error_description="Notification could not be sent"
+                    )
+            
+            try:
+                # Parse and validate the payload in a single pass
+                order_event = OrderEventMessage.model_validate_json(b''.join(msg.body))
+                logger.debug(f"Received Service Bus event: {order_event.event_type or 'unknown'}")
+                
+                # Process order events
+                source_id = f"servicebus:{msg.message_id}" if msg.message_id else None
+                await self.process_order_event(order_event, ack, source_id)
+                
+            except Exception as e:
+                logger.error(f"Error processing Service Bus event: {e}")
+                # Dead letter the message
+                await receiver.dead_letter_message(msg, reason="ProcessingError", error_description=str(e))
+        
+        # Prefetch several batches ahead so messages don't cost a credit round-trip each
+        max_message_count = SETTINGS.service_bus_max_message_count
+        
         async with self.servicebus_client:
             async with self.servicebus_client.get_subscription_receiver(
                 topic_name="order-events",
-                subscription_name="notification-service"
+                subscription_name="notification-service",
+                prefetch_count=max_message_count * 5
             ) as receiver:
-                async for msg in receiver:
-                    try:
-                        event_data = json.loads(str(msg))
-                        logger.debug(f"Received Service Bus event: {event_data.get('eventType', 'unknown')}")
-                        
-                        # Process order events
-                        await self.process_order_event(event_data)
-                        
-                        # Complete the message
-                        await receiver.complete_message(msg)
-                        
-                    except Exception as e:
-                        logger.error(f"Error processing Service Bus event: {e}")
-                        # Dead letter the message
-                        await receiver.dead_letter_message(msg, reason="ProcessingError", error_description=str(e))
+                while self.running:
+                    batch = await receiver.receive_messages(
+                        max_message_count=max_message_count,
+                        max_wait_time=2
+                    )
+                    for msg in batch:
+                        await handle_message(receiver, msg)
 
     async def shutdown(self):
         """Shutdown the service gracefully"""
         logger.info("Shutting down Notification Service...")
         self.running = False
         
+        # Cancel in-flight sends and wait for them to unwind, so their pooled
+        # connections are back in the pool before it is closed. Unacknowledged
+        # messages are redelivered
+        background_tasks = list(self._worker_tasks)
+        if self._smtp_keepalive_task:
+            background_tasks.append(self._smtp_keepalive_task)
+        for task in background_tasks:
+            task.cancel()
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+        
+        if self._smtp_pool:
+            while not self._smtp_pool.empty():
+                smtp = self._smtp_pool.get_nowait()
+                if smtp.is_connected:
+                    try:
+                        await smtp.quit()
+                    except aiosmtplib.SMTPException:
+                        smtp.close()
+        
         if self.eventhub_client:
+            await self._flush_checkpoints()
             await self.eventhub_client.close()
         
         if self.servicebus_client:
@@ -433,33 +866,50 @@ class NotificationService:
             await self.key_vault_client.close()
 
 # FastAPI app for health endpoints
-app = FastAPI(title="Notification Service", version="1.0.0")
+app = FastAPI(title="Notification Service", version="1.0.0", default_response_class=ORJSONResponse)
 
 # Global notification service instance
 notification_service: Optional[NotificationService] = None
 
+# Probe timestamp refreshed once a second instead of formatted per request
+_now_iso = datetime.utcnow().isoformat()
+_timestamp_task: Optional[asyncio.Task] = None
+
+async def _refresh_timestamp():
+    global _now_iso
+    while True:
+        _now_iso = datetime.utcnow().isoformat()
+        await asyncio.sleep(1)
+
 @app.on_event("startup")
 async def startup_event():
-    global notification_service
+    global notification_service, _timestamp_task
+    _timestamp_task = asyncio.create_task(_refresh_timestamp())
     notification_service = NotificationService()
     await notification_service.initialize()
     await notification_service.start_event_processing()
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    if _timestamp_task:
+        _timestamp_task.cancel()
     if notification_service:
         await notification_service.shutdown()
 
+# Static parts of the probe responses, built once at import
+_STATIC_INFO = {
+    'version': '1.0.0',
+    'environment': SETTINGS.environment
+}
+_STATIC_HEALTH = {'status': 'healthy', **_STATIC_INFO}
+_STATIC_READY = {'status': 'ready', **_STATIC_INFO}
+_STATIC_STARTUP = {'status': 'started', **_STATIC_INFO}
+
 # Health endpoints (following PRP requirement #6)
 @app.get("/health")
 async def health():
     """Health check endpoint for Kubernetes liveness probe"""
-    return {
-        'status': 'healthy',
-        'timestamp': datetime.utcnow().isoformat(),
-        'version': '1.0.0',
-        'environment': os.environ.get('ENVIRONMENT', 'dev')
-    }
+    return {**_STATIC_HEALTH, 'timestamp': _now_iso}
 
 @app.get("/ready")
 async def ready():
@@ -478,13 +928,7 @@ async def ready():
         if not any(ready_status.values()):
             raise HTTPException(status_code=503, detail="No notification channels available")
         
-        return {
-            'status': 'ready',
-            'timestamp': datetime.utcnow().isoformat(),
-            'version': '1.0.0',
-            'environment': os.environ.get('ENVIRONMENT', 'dev'),
-            'channels': ready_status
-        }
+        return {**_STATIC_READY, 'timestamp': _now_iso, 'channels': ready_status}
     except Exception as e:
         logger.error(f"Readiness check failed: {e}")
         raise HTTPException(status_code=503, detail=str(e))
@@ -492,12 +936,7 @@ async def ready():
 @app.get("/startup")
 async def startup():
     """Startup probe endpoint for Kubernetes"""
-    return {
-        'status': 'started',
-        'timestamp': datetime.utcnow().isoformat(),
-        'version': '1.0.0',
-        'environment': os.environ.get('ENVIRONMENT', 'dev')
-    }
+    return {**_STATIC_STARTUP, 'timestamp': _now_iso}
 
 # Signal handlers for graceful shutdown
 def signal_handler(signum, frame):
@@ -512,15 +951,17 @@ if __name__ == "__main__":
     signal.signal(signal.SIGTERM, signal_handler)
     
     # Run the application
-    port = int(os.environ.get('PORT', 8003))
+    port = SETTINGS.port
     
     logger.info(f'Starting Notification Service on port {port}')
-    logger.info(f'Environment: {os.environ.get("ENVIRONMENT", "dev")}')
+    logger.info(f'Environment: {SETTINGS.environment}')
     
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=port,
-        reload=os.environ.get("ENVIRONMENT") == "dev",
+        loop="uvloop",
+        http="httptools",
+        reload=SETTINGS.reload,
         log_level="info"
     )
\ No newline at end of file
@@ -0,0 +1,174 @@
+# tests/test_main.py
+# Test suite for Notification Service
+import asyncio
+import pytest
+from datetime import datetime
+from unittest.mock import AsyncMock
+
+from src.main import (
+    NotificationEvent,
+    NotificationService,
+    NotificationTemplate,
+    OrderEventMessage,
+    PaymentEventMessage,
+)
+
+def make_notification(**data) -> NotificationEvent:
+    """Build an order-created notification with the given template data"""
+    return NotificationEvent(
+        id="notification-id",
+        event_type="order.created",
+        customer_id="customer-id",
+        customer_email=data.pop("customer_email", "customer@example.com"),
+        template=NotificationTemplate.ORDER_CREATED,
+        data={
+            "customer_name": "Jane Doe",
+            "order_number": "12345",
+            "total_amount": 10,
+            "currency": "EUR",
+            "item_count": 1,
+            **data
+        },
+        timestamp=datetime.utcnow()
+    )
+
+@pytest.fixture
+def service():
+    """Notification service with SMTP configured but not connected"""
+    service = NotificationService()
+    service.smtp_config = {'username': 'shop@example.com'}
+    return service
+
+class TestEventParsing:
+    """Test order and payment event payload validation"""
+    
+    def test_numeric_order_number_and_null_fields(self):
+        """Test numeric ids are rendered as strings and nulls fall back to defaults"""
+        event = OrderEventMessage.model_validate_json(b'''{
+            "eventType": "order.status_changed",
+            "data": {
+                "customerId": 42,
+                "customerEmail": "customer@example.com",
+                "orderNumber": 12345,
+                "trackingNumber": null,
+                "estimatedDelivery": null,
+                "newStatus": "shipped"
+            }
+        }''')
+        
+        assert event.data.customer_id == "42"
+        assert event.data.order_number == "12345"
+        assert event.data.tracking_number == ""
+        assert event.data.estimated_delivery == ""
+        assert event.data.customer_name == "Valued Customer"
+    
+    def test_null_amounts_and_envelope_fields(self):
+        """Test nulls in numeric fields and the envelope fall back to defaults"""
+        event = OrderEventMessage.model_validate_json(
+            b'{"eventType": "order.created", "data": {"totalAmount": null, "itemCount": null}}'
+        )
+        assert event.data.total_amount == 0
+        assert event.data.item_count == 0
+        
+        event = OrderEventMessage.model_validate_json(b'{"eventType": null, "data": null}')
+        assert event.event_type == ""
+        assert event.data.order_number == "N/A"
+        assert event.data.customer_name == "Valued Customer"
+
+    def test_payment_event_numeric_and_null_fields(self):
+        """Test payment events render numeric ids and default explicit nulls"""
+        event = PaymentEventMessage.model_validate_json(b'''{
+            "event_type": "payment.processed",
+            "status": "failed",
+            "order_id": 123,
+            "customer_id": 42,
+            "customer_email": null,
+            "error_message": null
+        }''')
+        
+        assert event.order_id == "123"
+        assert event.customer_id == "42"
+        assert event.customer_email == ""
+        assert event.error_message == "Payment processing failed"
+        
+        event = PaymentEventMessage.model_validate_json(b'{"event_type": null, "order_id": null}')
+        assert event.event_type == ""
+        assert event.order_id == "N/A"
+
+class TestEmailFormatting:
+    """Test raw email message construction"""
+    
+    def test_build_email_headers_and_body(self, service):
+        """Test the message carries encoded headers and a transfer-encoded HTML body"""
+        message = service._build_email(make_notification(customer_name="Zoë"))
+        
+        headers, _, body = message.partition(b"\r\n\r\n")
+        assert b"From: shop@example.com" in headers
+        assert b"To: customer@example.com" in headers
+        assert b"Subject: Order Confirmation - #12345" in headers
+        assert b"Content-Type: text/html" in headers
+        assert b"Content-Transfer-Encoding: quoted-printable" in headers
+        assert message.isascii()
+        assert all(len(line) <= 998 for line in body.split(b"\r\n"))
+    
+    def test_build_email_rejects_header_injection(self, service):
+        """Test CR/LF in event fields cannot add headers"""
+        with pytest.raises(ValueError):
+            service._build_email(make_notification(order_number="1\r\nBcc: victim@example.com"))
+        
+        with pytest.raises(ValueError):
+            service._build_email(make_notification(customer_email="a@example.com\nBcc: victim@example.com"))
+
+class TestDeduplication:
+    """Test redelivered messages are not sent twice"""
+    
+    @pytest.mark.asyncio
+    async def test_redelivery_skipped_while_in_flight(self, service):
+        """Test a redelivery queued behind the original is acknowledged without sending"""
+        acks = []
+        
+        async def ack(success):
+            acks.append(success)
+        
+        duplicate = make_notification()
+        duplicate.source_id = "servicebus:message-1"
+        original = make_notification()
+        original.source_id = "servicebus:message-1"
+        await service.enqueue_notification(original, ack)
+        await service.enqueue_notification(duplicate, ack)
+        
+        assert service._work_q.qsize() == 1
+        assert acks == [True]
+    
+    @pytest.mark.asyncio
+    async def test_distinct_messages_for_same_order_are_sent(self, service):
+        """Test repeats of the same template and order from new messages are not suppressed"""
+        async def ack(success):
+            pass
+        
+        for source_id in ("eventhub:0:1", "eventhub:0:2"):
+            notification = make_notification()
+            notification.source_id = source_id
+            await service.enqueue_notification(notification, ack)
+        
+        assert service._work_q.qsize() == 2
+    
+    @pytest.mark.asyncio
+    async def test_failed_send_allows_redelivery(self, service):
+        """Test a source id is forgotten when its notification fails to send"""
+        acks = []
+        
+        async def ack(success):
+            acks.append(success)
+        
+        service._send_batch = AsyncMock(return_value=[False])
+        worker = asyncio.create_task(service._notification_worker())
+        
+        notification = make_notification()
+        notification.source_id = "servicebus:message-1"
+        await service.enqueue_notification(notification, ack)
+        await service._work_q.join()
+        worker.cancel()
+        
+        assert acks == [False]
+        assert "servicebus:message-1" not in service._seen
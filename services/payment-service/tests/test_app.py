@@ -0,0 +1,232 @@
+# tests/test_app.py
+# Test suite for Payment Service
+import queue
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import jwt
+import pytest
+from azure.servicebus.exceptions import MessageSizeExceededError
+
+import app as payment_service
+from app import app, get_jwt_secret
+
+# Test client
+client = app.test_client()
+
+# Mock data
+test_payment = {
+    "order_id": "order-123",
+    "amount": 49.99,
+    "currency": "USD",
+    "customer_id": "customer-123",
+    "payment_method": "credit_card",
+    "card_token": "tok_test",
+    "billing_address": {"country": "US"}
+}
+
+def make_token(secret=None, ttl=300, sub="customer-123"):
+    """Encode a JWT signed with the given or the service's secret"""
+    return jwt.encode(
+        {"sub": sub, "exp": int(time.time()) + ttl},
+        secret or get_jwt_secret(),
+        algorithm="HS256"
+    )
+
+@pytest.fixture
+def auth_headers():
+    """Bearer token signed with the service's JWT secret"""
+    return {"Authorization": f"Bearer {make_token()}"}
+
+@pytest.fixture
+def jwt_state(monkeypatch):
+    """Isolate the JWT cache and loaded secret from other tests"""
+    monkeypatch.setattr(payment_service, "_jwt_cache", {})
+    monkeypatch.setattr(payment_service, "_jwt_secret", payment_service._jwt_secret)
+    monkeypatch.setattr(payment_service, "_jwt_secret_loaded_at", payment_service._jwt_secret_loaded_at)
+    monkeypatch.setattr(payment_service, "key_vault_client", None)
+
+class FakeBatch:
+    """Service Bus message batch holding at most `capacity` messages"""
+    
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.messages = []
+    
+    def add_message(self, message):
+        if len(self.messages) >= self.capacity:
+            raise MessageSizeExceededError(message="Batch is full")
+        self.messages.append(message)
+    
+    def __len__(self):
+        return len(self.messages)
+
+class FakeSender:
+    """Service Bus sender recording the messages of every sent batch"""
+    
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self.sent = []
+        self.closed = False
+    
+    def create_message_batch(self):
+        return FakeBatch(self.capacity)
+    
+    def send_messages(self, batch):
+        self.sent.append(list(batch.messages))
+    
+    def close(self):
+        self.closed = True
+
+@pytest.fixture
+def pending(monkeypatch):
+    """Fresh publish queue and publisher thread list"""
+    pending = queue.Queue()
+    monkeypatch.setattr(payment_service, "_pending_messages", pending)
+    monkeypatch.setattr(payment_service, "_publish_threads", [])
+    return pending
+
+class TestRequestValidation:
+    """Test payment and refund request validation"""
+    
+    def test_payment_rejects_unknown_fields(self, auth_headers):
+        """Test a misspelled field is reported instead of silently dropped"""
+        response = client.post(
+            "/api/payments",
+            json={**test_payment, "ammount": 10},
+            headers=auth_headers
+        )
+        assert response.status_code == 400
+        assert "ammount" in response.get_json()["details"]
+    
+    def test_refund_rejects_unknown_fields(self, auth_headers):
+        """Test refund requests reject unknown fields"""
+        response = client.post(
+            "/api/payments/payment-123/refund",
+            json={"reason": "duplicate", "refund_reason": "typo"},
+            headers=auth_headers
+        )
+        assert response.status_code == 400
+        assert "refund_reason" in response.get_json()["details"]
+
+class TestAuthentication:
+    """Test JWT validation, caching and secret refresh"""
+    
+    def test_reused_token_skips_decode(self, jwt_state):
+        """Test a cached token is not decoded again"""
+        headers = {"Authorization": f"Bearer {make_token(sub='cached-user')}"}
+        
+        with patch("app.jwt.decode", wraps=jwt.decode) as mock_decode:
+            for _ in range(3):
+                response = client.get("/api/payments/payment-123", headers=headers)
+                assert response.status_code == 200
+        
+        assert mock_decode.call_count == 1
+    
+    def test_token_expiry_caps_cache_ttl(self, jwt_state):
+        """Test a token is cached no longer than its own lifetime"""
+        headers = {"Authorization": f"Bearer {make_token(ttl=5)}"}
+        
+        response = client.get("/api/payments/payment-123", headers=headers)
+        assert response.status_code == 200
+        
+        (_, expires), = payment_service._jwt_cache.values()
+        assert expires - time.monotonic() <= 5
+        assert payment_service.JWT_CACHE_TTL > 5
+    
+    def test_malformed_token_rejected_without_decoding(self, jwt_state):
+        """Test a token not shaped like a JWT is rejected before the JWT library"""
+        with patch("app.jwt.decode") as mock_decode:
+            response = client.get(
+                "/api/payments/payment-123",
+                headers={"Authorization": "Bearer not-a-jwt"}
+            )
+        
+        assert response.status_code == 401
+        assert response.get_json()["error"] == "Token invalid"
+        mock_decode.assert_not_called()
+    
+    def test_signature_mismatch_reloads_rotated_secret(self, jwt_state, monkeypatch):
+        """Test a token signed with a rotated secret triggers a Key Vault reload"""
+        monkeypatch.setattr(payment_service, "_jwt_secret", "old-secret-0123456789abcdef0123456789")
+        monkeypatch.setattr(payment_service, "_jwt_secret_loaded_at", 0.0)
+        key_vault = MagicMock()
+        key_vault.get_secret.return_value.value = "rotated-secret-0123456789abcdef012345"
+        monkeypatch.setattr(payment_service, "key_vault_client", key_vault)
+        
+        response = client.get(
+            "/api/payments/payment-123",
+            headers={"Authorization": f"Bearer {make_token('rotated-secret-0123456789abcdef012345')}"}
+        )
+        
+        assert response.status_code == 200
+        assert payment_service._jwt_secret == "rotated-secret-0123456789abcdef012345"
+    
+    def test_failed_refresh_keeps_loaded_secret(self, jwt_state, monkeypatch):
+        """Test a Key Vault failure on refresh does not replace the loaded secret"""
+        monkeypatch.setattr(payment_service, "_jwt_secret", "loaded-secret")
+        key_vault = MagicMock()
+        key_vault.get_secret.side_effect = RuntimeError("Key Vault unavailable")
+        monkeypatch.setattr(payment_service, "key_vault_client", key_vault)
+        
+        assert payment_service.load_jwt_secret() == "loaded-secret"
+        assert payment_service.get_jwt_secret() == "loaded-secret"
+
+class TestPublisher:
+    """Test batched publishing of payment results to Service Bus"""
+    
+    def test_flushes_full_batches(self, pending):
+        """Test queued messages are sent in batches of PUBLISH_BATCH_MAX"""
+        sender = FakeSender()
+        for i in range(450):
+            pending.put(i)
+        pending.put(None)
+        
+        payment_service._publish_worker(sender)
+        
+        assert [len(batch) for batch in sender.sent] == [200, 200, 50]
+        assert [m for batch in sender.sent for m in batch] == list(range(450))
+    
+    def test_flushes_partial_batch_after_linger(self, pending):
+        """Test a partial batch is sent once the linger time passes"""
+        sender = FakeSender()
+        worker = threading.Thread(target=payment_service._publish_worker, args=(sender,))
+        worker.start()
+        try:
+            for i in range(3):
+                pending.put(i)
+            
+            deadline = time.monotonic() + 2
+            while not sender.sent and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert sender.sent == [[0, 1, 2]]
+        finally:
+            pending.put(None)
+            worker.join(timeout=2)
+        assert not worker.is_alive()
+    
+    def test_splits_batch_when_size_exceeded(self):
+        """Test messages that overflow a batch are sent in a new one"""
+        sender = FakeSender(capacity=2)
+        
+        payment_service._send_batch(sender, list(range(5)))
+        
+        assert sender.sent == [[0, 1], [2, 3], [4]]
+    
+    def test_shutdown_drains_pending_messages(self, pending, monkeypatch):
+        """Test shutdown sends everything queued before stopping the publishers"""
+        sender = FakeSender()
+        client = MagicMock()
+        monkeypatch.setattr(payment_service, "payment_queue_senders", [sender])
+        monkeypatch.setattr(payment_service, "servicebus_clients", [client])
+        
+        payment_service.start_publisher()
+        for i in range(250):
+            pending.put(i)
+        payment_service.shutdown_azure_services()
+        
+        assert [m for batch in sender.sent for m in batch] == list(range(250))
+        assert not any(thread.is_alive() for thread in payment_service._publish_threads)
+        assert sender.closed
+        client.close.assert_called_once()
@@ -0,0 +1,6 @@
+# wsgi.py
+# Gunicorn entry point - each worker process initializes its own Azure clients
+
+from app import create_app
+
+application = create_app()
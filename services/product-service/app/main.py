@@ -4,23 +4,31 @@
 
 from fastapi import FastAPI, HTTPException, Depends, status, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from contextlib import asynccontextmanager
+import asyncio
 import os
 import logging
-from typing import Optional, List
+import time
+from typing import Dict, Optional, List, Tuple
+import aiohttp
+from azure.core.pipeline.transport import AioHttpTransport
 from azure.cosmos.aio import CosmosClient, DatabaseProxy, ContainerProxy
-from azure.identity.aio import DefaultAzureCredential
+from azure.identity.aio import DefaultAzureCredential, ManagedIdentityCredential
 from opentelemetry.instrumentation.fastapi import FastAPIInstrumentor
 from opentelemetry import trace, metrics
 from opentelemetry.exporter.prometheus import PrometheusMetricReader
 from opentelemetry.sdk.metrics import MeterProvider
+from opentelemetry.sdk.resources import Resource
 from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
 from opentelemetry.sdk.trace.export import BatchSpanProcessor
-from opentelemetry.exporter.jaeger.thrift import JaegerExporter
+from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+from grpc import Compression
 from pydantic import BaseModel, Field
-from datetime import datetime
+from datetime import datetime, timezone
 import json
 import uuid
 
@@ -45,8 +53,8 @@ class Product(BaseModel):
     stock_quantity: int = Field(..., ge=0)
     image_url: Optional[str] = None
     is_active: bool = True
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 class ProductUpdate(BaseModel):
     name: Optional[str] = Field(None, min_length=1, max_length=200)
@@ -64,34 +72,108 @@ class HealthResponse(BaseModel):
     version: str = "1.0.0"
     environment: str
 
-class ProductResponse(BaseModel):
-    products: List[Product]
+class ProductListItem(BaseModel):
+    """Fields rendered by product listings; full documents come from get_product"""
+    id: str
+    name: str
+    description: Optional[str] = None
+    price: float
+    category: str
+    sku: str
+    stock_quantity: int
+    image_url: Optional[str] = None
+    is_active: bool = True
+    created_at: datetime
+
+class ProductListResponse(BaseModel):
+    products: List[ProductListItem]
     total_count: int
     page: int
     page_size: int
+    continuation_token: Optional[str] = None
 
 # Global variables for Azure services
+http_session: Optional[aiohttp.ClientSession] = None
 cosmos_client: Optional[CosmosClient] = None
 database: Optional[DatabaseProxy] = None
 container: Optional[ContainerProxy] = None
 
+def configure_tracing() -> Optional[TracerProvider]:
+    """Export spans over OTLP/gRPC when a collector endpoint is configured
+    
+    Without OTEL_EXPORTER_OTLP_ENDPOINT no provider is installed and spans
+    stay no-ops.
+    """
+    endpoint = os.environ.get("OTEL_EXPORTER_OTLP_ENDPOINT")
+    if not endpoint:
+        return None
+    
+    # Sample a fraction of root requests; downstream spans follow the parent
+    sampler = ParentBased(root=TraceIdRatioBased(float(os.environ.get("OTEL_SAMPLE_RATIO", "0.05"))))
+    provider = TracerProvider(
+        sampler=sampler,
+        resource=Resource.create({"service.name": "product-service"})
+    )
+    provider.add_span_processor(BatchSpanProcessor(
+        OTLPSpanExporter(endpoint=endpoint, compression=Compression.Gzip),
+        max_queue_size=4096,
+        max_export_batch_size=512,
+        schedule_delay_millis=2000
+    ))
+    trace.set_tracer_provider(provider)
+    return provider
+
+def create_credential():
+    """Create the Azure credential for Cosmos DB access
+    
+    In-cluster the managed identity is used directly so token refreshes do
+    not walk DefaultAzureCredential's environment, CLI and IDE probes first.
+    """
+    if os.environ.get("KUBERNETES_SERVICE_HOST"):
+        return ManagedIdentityCredential(client_id=os.environ.get("AZURE_CLIENT_ID"))
+    return DefaultAzureCredential(exclude_visual_studio_code_credential=True)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     logger.info("Starting Product Service...")
     
-    global cosmos_client, database, container
+    global http_session, cosmos_client, database, container
+    
+    tracer_provider = configure_tracing()
     
     try:
         # Initialize Azure credentials and Cosmos client
         logger.info("Initializing Azure Cosmos DB connection...")
-        credential = DefaultAzureCredential()
+        credential = create_credential()
+        app.state.credential = credential
         cosmos_endpoint = os.environ.get("COSMOS_ENDPOINT")
         
         if not cosmos_endpoint:
             raise ValueError("COSMOS_ENDPOINT environment variable is required")
         
-        cosmos_client = CosmosClient(cosmos_endpoint, credential=credential)
+        # One warm connection pool for all Cosmos traffic; the longer
+        # keepalive avoids re-handshaking TLS after short idle gaps
+        connector = aiohttp.TCPConnector(
+            limit=200,
+            limit_per_host=100,
+            keepalive_timeout=120,
+            ttl_dns_cache=300
+        )
+        http_session = aiohttp.ClientSession(connector=connector)
+        transport = AioHttpTransport(session=http_session, session_owner=False)
+        
+        # Session consistency gives read-your-writes per client without
+        # the cross-replica cost of stronger levels, which also lets reads be
+        # served by the pod's local replica when the account has one there
+        azure_region = os.environ.get("AZURE_REGION")
+        cosmos_client = CosmosClient(
+            cosmos_endpoint,
+            credential=credential,
+            consistency_level="Session",
+            preferred_locations=[azure_region] if azure_region else [],
+            transport=transport
+        )
         database = cosmos_client.get_database_client("products")
         container = database.get_container_client("products")
         
@@ -109,12 +191,18 @@ async def lifespan(app: FastAPI):
     logger.info("Shutting down Product Service...")
     if cosmos_client:
         await cosmos_client.close()
+    if http_session:
+        await http_session.close()
+    await app.state.credential.close()
+    if tracer_provider:
+        tracer_provider.shutdown()
 
 app = FastAPI(
     title="Product Service",
     description="E-Commerce Product Management Service",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     docs_url="/docs",
     redoc_url="/redoc",
     openapi_url="/openapi.json"
@@ -171,13 +259,25 @@ async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(secur
         )
     return credentials.credentials
 
+# Probe timestamps only change once per second, so the value is reused
+# across the probes served within the same second
+_probe_timestamp: Tuple[int, Optional[datetime]] = (0, None)
+
+def probe_timestamp() -> datetime:
+    """Current UTC time, truncated to the cached second"""
+    global _probe_timestamp
+    bucket = int(time.time())
+    if _probe_timestamp[0] != bucket:
+        _probe_timestamp = (bucket, datetime.fromtimestamp(bucket, timezone.utc))
+    return _probe_timestamp[1]
+
 # Health endpoints matching K8s probes pattern (following PRP requirement #6)
 @app.get("/health", response_model=HealthResponse)
 async def health():
     """Health check endpoint for Kubernetes liveness probe"""
     return HealthResponse(
         status="healthy",
-        timestamp=datetime.utcnow(),
+        timestamp=probe_timestamp(),
         environment=os.environ.get("ENVIRONMENT", "dev")
     )
 
@@ -195,7 +295,7 @@ async def ready():
         await database.read()
         return HealthResponse(
             status="ready",
-            timestamp=datetime.utcnow(),
+            timestamp=probe_timestamp(),
             environment=os.environ.get("ENVIRONMENT", "dev")
         )
     except Exception as e:
@@ -210,7 +310,7 @@ async def startup():
     """Startup probe endpoint for Kubernetes"""
     return HealthResponse(
         status="started",
-        timestamp=datetime.utcnow(),
+        timestamp=probe_timestamp(),
         environment=os.environ.get("ENVIRONMENT", "dev")
     )
 
@@ -220,66 +320,187 @@ async def metrics_endpoint():
     """Prometheus metrics endpoint"""
     return {"message": "Metrics available at /metrics"}
 
+# Cosmos query helpers
+# The products container is partitioned on /category
+def query_options(category: Optional[str]) -> dict:
+    """Build common query options, scoped to one partition when the category is known"""
+    # Query metrics are only useful when diagnosing a query; skipping them
+    # keeps the response headers and server-side work down
+    options = {"populate_query_metrics": False}
+    if category:
+        options["partition_key"] = category
+    else:
+        options["enable_cross_partition_query"] = True
+    return options
+
+async def fetch_products(
+    query: str,
+    parameters: List[dict],
+    page_size: int,
+    continuation_token: Optional[str] = None,
+    category: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """Fetch one page of a product query and the token for the next page"""
+    items = container.query_items(
+        query=query,
+        parameters=parameters,
+        max_item_count=page_size,
+        **query_options(category)
+    )
+    
+    # One server page per request; the raw items are validated once, by
+    # the endpoint's response model
+    pager = items.by_page(continuation_token)
+    result_page = await anext(pager, None)
+    if result_page is None:
+        return [], None
+    
+    page_items = [item async for item in result_page]
+    return page_items, pager.continuation_token
+
+async def fetch_count(query: str, parameters: List[dict], category: Optional[str] = None) -> int:
+    """Run a COUNT query and return its single value"""
+    count_items = container.query_items(
+        query=query,
+        parameters=parameters,
+        **query_options(category)
+    )
+    return [count async for count in count_items][0]
+
+# Totals are an aggregate over every matching item, so they are cached
+# briefly per filter rather than recounted on every page request
+COUNT_CACHE_TTL = 30
+COUNT_CACHE_SIZE = 256
+
+_count_cache: Dict[Tuple[bool, Optional[str]], Tuple[int, float]] = {}
+
+async def fetch_cached_count(
+    active_only: bool,
+    category: Optional[str],
+    query: str,
+    parameters: List[dict]
+) -> int:
+    """Return the total for a filter, recounting once the cached value expires"""
+    key = (active_only, category)
+    cached = _count_cache.get(key)
+    if cached and cached[1] > time.monotonic():
+        return cached[0]
+    
+    total_count = await fetch_count(query, parameters, category)
+    
+    now = time.monotonic()
+    if len(_count_cache) >= COUNT_CACHE_SIZE:
+        for stale in [k for k, (_, expires) in _count_cache.items() if expires <= now]:
+            del _count_cache[stale]
+        if len(_count_cache) >= COUNT_CACHE_SIZE:
+            del _count_cache[next(iter(_count_cache))]
+    _count_cache[key] = (total_count, now + COUNT_CACHE_TTL)
+    return total_count
+
+async def find_product(product_id: str) -> Optional[dict]:
+    """Look up a product by id alone when its category is not known"""
+    items = container.query_items(
+        query="SELECT * FROM c WHERE c.id = @id",
+        parameters=[{"name": "@id", "value": product_id}],
+        max_item_count=1,
+        **query_options(None)
+    )
+    async for item in items:
+        return item
+    return None
+
+async def resolve_category(product_id: str, category: Optional[str]) -> str:
+    """Return the partition key for a product, looking it up if not supplied"""
+    if category:
+        return category
+    
+    item = await find_product(product_id)
+    if item is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Product {product_id} not found"
+        )
+    return item["category"]
+
+def patch_operations(fields: dict) -> List[dict]:
+    """Build Cosmos patch operations that set each field to its new value"""
+    return [{"op": "set", "path": f"/{name}", "value": value} for name, value in fields.items()]
+
+# In-flight writes are capped per worker so bursts queue here instead of
+# being throttled by Cosmos DB. Throttled (429) writes are retried by the
+# Cosmos client itself, honouring the server's retry-after hint
+COSMOS_MAX_INFLIGHT_WRITES = int(os.environ.get("COSMOS_MAX_INFLIGHT_WRITES", "32"))
+
+WRITE_SEM = asyncio.Semaphore(COSMOS_MAX_INFLIGHT_WRITES)
+
+async def write_item(operation, **kwargs):
+    """Run a Cosmos write under the in-flight cap"""
+    async with WRITE_SEM:
+        return await operation(**kwargs)
+
+# List queries project only the ProductListItem fields
+LIST_COLUMNS = ", ".join(f"c.{name}" for name in ProductListItem.model_fields)
+
 # Product API endpoints
-@app.get("/api/products", response_model=ProductResponse)
+@app.get("/api/products", response_model=ProductListResponse)
 async def get_products(
     category: Optional[str] = Query(None, description="Filter by category"),
     active_only: bool = Query(True, description="Return only active products"),
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(10, ge=1, le=100, description="Items per page"),
+    continuation_token: Optional[str] = Query(None, description="Token from the previous page"),
     token: str = Depends(verify_token)
 ):
     """Get paginated list of products with optional filtering"""
     with tracer.start_as_current_span("get_products") as span:
-        span.set_attribute("category", category or "all")
-        span.set_attribute("page", page)
-        span.set_attribute("page_size", page_size)
+        if span.is_recording():
+            span.set_attributes({
+                "category": category or "all",
+                "page": page,
+                "page_size": page_size
+            })
         
         try:
-            query = "SELECT * FROM c WHERE 1=1"
+            # The item and count queries share one parameterized filter
+            where = " WHERE 1=1"
             parameters = []
             
             if active_only:
-                query += " AND c.is_active = @active"
+                where += " AND c.is_active = @active"
                 parameters.append({"name": "@active", "value": True})
             
             if category:
-                query += " AND c.category = @category"
+                where += " AND c.category = @category"
                 parameters.append({"name": "@category", "value": category})
             
-            # Add ordering and pagination
-            query += " ORDER BY c.created_at DESC"
-            query += f" OFFSET {(page - 1) * page_size} LIMIT {page_size}"
-            
-            items = container.query_items(
-                query=query,
-                parameters=parameters,
-                enable_cross_partition_query=True
-            )
+            query = f"SELECT {LIST_COLUMNS} FROM c" + where
             
-            products = [Product(**item) async for item in items]
+            # Add ordering and pagination. Continuation tokens resume where
+            # the previous page stopped; OFFSET is only kept for clients that
+            # jump straight to a page number, since it rereads every skipped item
+            query += " ORDER BY c.created_at DESC"
+            use_offset = page > 1 and not continuation_token
+            if use_offset:
+                query += f" OFFSET {(page - 1) * page_size} LIMIT {page_size}"
             
             # Get total count for pagination
-            count_query = "SELECT VALUE COUNT(1) FROM c WHERE 1=1"
-            if active_only:
-                count_query += " AND c.is_active = true"
-            if category:
-                count_query += f" AND c.category = '{category}'"
+            count_query = "SELECT VALUE COUNT(1) FROM c" + where
             
-            count_items = container.query_items(
-                query=count_query,
-                enable_cross_partition_query=True
+            # The page and the count are independent, so fetch them together
+            (products, next_token), total_count = await asyncio.gather(
+                fetch_products(query, parameters, page_size, continuation_token, category),
+                fetch_cached_count(active_only, category, count_query, parameters)
             )
-            total_count = [count async for count in count_items][0]
             
             product_requests_counter.add(1, {"operation": "list", "category": category or "all"})
             
-            return ProductResponse(
-                products=products,
-                total_count=total_count,
-                page=page,
-                page_size=page_size
-            )
+            return {
+                "products": products,
+                "total_count": total_count,
+                "page": page,
+                "page_size": page_size,
+                "continuation_token": None if use_offset else next_token
+            }
             
         except Exception as e:
             logger.error(f"Failed to get products: {e}")
@@ -290,19 +511,26 @@ async def get_products(
             )
 
 @app.get("/api/products/{product_id}", response_model=Product)
-async def get_product(product_id: str, token: str = Depends(verify_token)):
+async def get_product(
+    product_id: str,
+    category: Optional[str] = Query(None, description="Product category, enables a point read"),
+    token: str = Depends(verify_token)
+):
     """Get a specific product by ID"""
     with tracer.start_as_current_span("get_product") as span:
-        span.set_attribute("product_id", product_id)
+        if span.is_recording():
+            span.set_attribute("product_id", product_id)
         
         try:
-            item = await container.read_item(
-                item=product_id,
-                partition_key=product_id  # Using ID as partition key for simplicity
-            )
+            if category:
+                item = await container.read_item(item=product_id, partition_key=category)
+            else:
+                item = await find_product(product_id)
+                if item is None:
+                    raise LookupError(product_id)
             
             product_requests_counter.add(1, {"operation": "get"})
-            return Product(**item)
+            return item
             
         except Exception as e:
             logger.error(f"Failed to get product {product_id}: {e}")
@@ -316,18 +544,23 @@ async def get_product(product_id: str, token: str = Depends(verify_token)):
 async def create_product(product: Product, token: str = Depends(verify_token)):
     """Create a new product"""
     with tracer.start_as_current_span("create_product") as span:
-        span.set_attribute("product_name", product.name)
-        span.set_attribute("product_category", product.category)
+        if span.is_recording():
+            span.set_attributes({
+                "product_name": product.name,
+                "product_category": product.category
+            })
         
         try:
             # Ensure timestamps are set
-            product.created_at = datetime.utcnow()
-            product.updated_at = datetime.utcnow()
+            now = datetime.now(timezone.utc)
+            product.created_at = now
+            product.updated_at = now
             
-            # Convert to dict for Cosmos DB
-            product_dict = product.model_dump()
+            # Convert to a JSON-safe dict for Cosmos DB
+            product_dict = product.model_dump(mode="json")
             
-            await container.create_item(
+            await write_item(
+                container.create_item,
                 body=product_dict,
                 partition_key=product.category
             )
@@ -345,45 +578,92 @@ async def create_product(product: Product, token: str = Depends(verify_token)):
                 detail="Failed to create product"
             )
 
+# Cosmos DB caps a transactional batch at 100 operations
+BATCH_MAX_OPERATIONS = 100
+
+@app.post("/api/products/bulk", response_model=List[Product], status_code=status.HTTP_201_CREATED)
+async def create_products_bulk(products: List[Product], token: str = Depends(verify_token)):
+    """
+    Create many products with one transactional batch per category chunk
+    Each batch is atomic; batches for different categories are not
+    """
+    with tracer.start_as_current_span("create_products_bulk") as span:
+        if span.is_recording():
+            span.set_attribute("product_count", len(products))
+        
+        try:
+            now = datetime.now(timezone.utc)
+            by_category: Dict[str, List[dict]] = {}
+            for product in products:
+                product.created_at = now
+                product.updated_at = now
+                by_category.setdefault(product.category, []).append(product.model_dump(mode="json"))
+            
+            # Batches are scoped to a single partition key value
+            await asyncio.gather(*(
+                write_item(
+                    container.execute_item_batch,
+                    batch_operations=[("create", (item,)) for item in items[start:start + BATCH_MAX_OPERATIONS]],
+                    partition_key=category
+                )
+                for category, items in by_category.items()
+                for start in range(0, len(items), BATCH_MAX_OPERATIONS)
+            ))
+            
+            for category, items in by_category.items():
+                product_requests_counter.add(len(items), {"operation": "create", "category": category})
+            logger.info(f"Created {len(products)} products in bulk")
+            
+            return products
+            
+        except Exception as e:
+            logger.error(f"Failed to bulk create products: {e}")
+            span.record_exception(e)
+            raise HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+                detail="Failed to create products"
+            )
+
 @app.put("/api/products/{product_id}", response_model=Product)
 async def update_product(
     product_id: str,
     product_update: ProductUpdate,
+    category: Optional[str] = Query(None, description="Current product category"),
     token: str = Depends(verify_token)
 ):
     """Update an existing product"""
     with tracer.start_as_current_span("update_product") as span:
-        span.set_attribute("product_id", product_id)
+        if span.is_recording():
+            span.set_attribute("product_id", product_id)
         
         try:
-            # Get existing product
-            existing_item = await container.read_item(
-                item=product_id,
-                partition_key=product_id
-            )
-            
-            existing_product = Product(**existing_item)
-            
-            # Update fields
+            # Patch only the supplied fields in one server-side operation
+            # instead of reading and replacing the whole document
             update_data = product_update.model_dump(exclude_unset=True)
-            for field, value in update_data.items():
-                setattr(existing_product, field, value)
+            update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
             
-            existing_product.updated_at = datetime.utcnow()
+            # The category is the partition key, which Cosmos DB cannot patch
+            partition_key = await resolve_category(product_id, category)
+            if update_data.pop("category", partition_key) != partition_key:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="A product's category cannot be changed; create it in the new category instead"
+                )
             
-            # Save updated product
-            product_dict = existing_product.model_dump()
-            await container.replace_item(
+            updated_item = await write_item(
+                container.patch_item,
                 item=product_id,
-                body=product_dict,
-                partition_key=existing_product.category
+                partition_key=partition_key,
+                patch_operations=patch_operations(update_data)
             )
             
             product_requests_counter.add(1, {"operation": "update"})
             logger.info(f"Updated product: {product_id}")
             
-            return existing_product
+            return updated_item
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Failed to update product {product_id}: {e}")
             span.record_exception(e)
@@ -393,33 +673,32 @@ async def update_product(
             )
 
 @app.delete("/api/products/{product_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_product(product_id: str, token: str = Depends(verify_token)):
+async def delete_product(
+    product_id: str,
+    category: Optional[str] = Query(None, description="Product category"),
+    token: str = Depends(verify_token)
+):
     """Delete a product (soft delete by setting is_active to False)"""
     with tracer.start_as_current_span("delete_product") as span:
-        span.set_attribute("product_id", product_id)
+        if span.is_recording():
+            span.set_attribute("product_id", product_id)
         
         try:
-            # Get existing product
-            existing_item = await container.read_item(
-                item=product_id,
-                partition_key=product_id
-            )
-            
-            existing_product = Product(**existing_item)
-            existing_product.is_active = False
-            existing_product.updated_at = datetime.utcnow()
-            
-            # Save updated product
-            product_dict = existing_product.model_dump()
-            await container.replace_item(
+            await write_item(
+                container.patch_item,
                 item=product_id,
-                body=product_dict,
-                partition_key=existing_product.category
+                partition_key=await resolve_category(product_id, category),
+                patch_operations=patch_operations({
+                    "is_active": False,
+                    "updated_at": datetime.now(timezone.utc).isoformat()
+                })
             )
             
             product_requests_counter.add(1, {"operation": "delete"})
             logger.info(f"Deleted (soft) product: {product_id}")
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Failed to delete product {product_id}: {e}")
             span.record_exception(e)
@@ -428,11 +707,12 @@ async def delete_product(product_id: str, token: str = Depends(verify_token)):
                 detail="Failed to delete product"
             )
 
-@app.get("/api/products/category/{category}", response_model=ProductResponse)
+@app.get("/api/products/category/{category}", response_model=ProductListResponse)
 async def get_products_by_category(
     category: str,
     page: int = Query(1, ge=1),
     page_size: int = Query(10, ge=1, le=100),
+    continuation_token: Optional[str] = Query(None),
     token: str = Depends(verify_token)
 ):
     """Get products by category"""
@@ -441,16 +721,23 @@ async def get_products_by_category(
         active_only=True,
         page=page,
         page_size=page_size,
+        continuation_token=continuation_token,
         token=token
     )
 
 if __name__ == "__main__":
     import uvicorn
     
+    reload = os.environ.get("ENVIRONMENT") == "dev"
+    
     uvicorn.run(
         "main:app",
         host="0.0.0.0",
         port=8000,
-        reload=os.environ.get("ENVIRONMENT") == "dev",
+        loop="uvloop",
+        http="httptools",
+        # Each worker process holds its own Cosmos client; reload runs one
+        workers=1 if reload else int(os.environ.get("WEB_CONCURRENCY", os.cpu_count() or 2)),
+        reload=reload,
         log_level="info"
     )
\ No newline at end of file
@@ -11,7 +11,7 @@ from datetime import datetime
 os.environ["COSMOS_ENDPOINT"] = "https://test-cosmos.documents.azure.com:443/"
 os.environ["ENVIRONMENT"] = "test"
 
-from app.main import app, Product
+from app.main import app, Product, verify_token, _count_cache
 
 # Test client
 client = TestClient(app)
@@ -54,12 +54,53 @@ def mock_cosmos_client():
         
         yield mock_container
 
+class MockQueryResult:
+    """Stand-in for the AsyncItemPaged returned by query_items"""
+    
+    def __init__(self, *pages):
+        self.pages = pages
+    
+    def __aiter__(self):
+        return self._items()
+    
+    async def _items(self):
+        for page in self.pages:
+            for item in page:
+                yield item
+    
+    def by_page(self, continuation_token=None):
+        return MockPager(self.pages)
+
+class MockPager:
+    """Stand-in for the page iterator returned by by_page"""
+    
+    def __init__(self, pages):
+        self._pages = iter(pages)
+        self.continuation_token = None
+    
+    def __aiter__(self):
+        return self
+    
+    async def __anext__(self):
+        try:
+            page = next(self._pages)
+        except StopIteration:
+            raise StopAsyncIteration
+        self.continuation_token = "next-page-token"
+        return MockQueryResult(page)
+
+def mock_query_items(*args, **kwargs):
+    """Serve a count for COUNT queries and one page of products otherwise"""
+    if 'COUNT' in kwargs.get('query', ''):
+        return MockQueryResult([1])
+    return MockQueryResult([test_product])
+
 @pytest.fixture
 def mock_auth():
     """Mock authentication for testing"""
-    with patch('app.main.verify_token') as mock_verify:
-        mock_verify.return_value = "test-token"
-        yield mock_verify
+    app.dependency_overrides[verify_token] = lambda: "test-token"
+    yield
+    app.dependency_overrides.pop(verify_token, None)
 
 class TestHealthEndpoints:
     """Test health check endpoints"""
@@ -95,14 +136,7 @@ class TestProductEndpoints:
     @patch('app.main.container')
     def test_get_products(self, mock_container, mock_auth):
         """Test getting products list"""
-        # Mock query results
-        async def mock_query_items(*args, **kwargs):
-            if 'COUNT' in kwargs.get('query', ''):
-                yield 1
-            else:
-                yield test_product
-        
-        mock_container.query_items.return_value = mock_query_items()
+        mock_container.query_items.side_effect = mock_query_items
         
         response = client.get("/api/products")
         assert response.status_code == 200
@@ -111,22 +145,68 @@ class TestProductEndpoints:
         assert "total_count" in data
         assert data["page"] == 1
         assert data["page_size"] == 10
+        assert data["continuation_token"] == "next-page-token"
+        assert "updated_at" not in data["products"][0]
+        
+        item_query = next(
+            call.kwargs['query'] for call in mock_container.query_items.call_args_list
+            if 'COUNT' not in call.kwargs['query']
+        )
+        assert item_query.startswith("SELECT c.id, c.name, ")
+    
+    @patch('app.main.container')
+    def test_get_products_caches_total_count(self, mock_container, mock_auth):
+        """Test repeated list requests reuse the cached total count"""
+        _count_cache.clear()
+        mock_container.query_items.side_effect = mock_query_items
+        
+        for _ in range(2):
+            response = client.get("/api/products?category=toys")
+            assert response.status_code == 200
+            assert response.json()["total_count"] == 1
+        
+        count_queries = [
+            call for call in mock_container.query_items.call_args_list
+            if 'COUNT' in call.kwargs['query']
+        ]
+        assert len(count_queries) == 1
+        assert "toys" not in count_queries[0].kwargs['query']
+        assert {"name": "@category", "value": "toys"} in count_queries[0].kwargs['parameters']
     
     @patch('app.main.container')
     def test_get_product_by_id(self, mock_container, mock_auth):
         """Test getting a specific product by ID"""
-        mock_container.read_item.return_value = test_product
+        mock_container.read_item = AsyncMock(return_value=test_product)
         
-        response = client.get("/api/products/test-product-id")
+        response = client.get("/api/products/test-product-id?category=electronics")
         assert response.status_code == 200
         data = response.json()
         assert data["id"] == "test-product-id"
         assert data["name"] == "Test Product"
+        mock_container.read_item.assert_awaited_once_with(
+            item="test-product-id", partition_key="electronics"
+        )
+    
+    @patch('app.main.container')
+    def test_get_product_without_category(self, mock_container, mock_auth):
+        """Test getting a product by ID alone falls back to an id query"""
+        mock_container.query_items.return_value = MockQueryResult([test_product])
+        
+        response = client.get("/api/products/test-product-id")
+        assert response.status_code == 200
+        assert response.json()["id"] == "test-product-id"
+        assert mock_container.query_items.call_args.kwargs['parameters'] == [
+            {"name": "@id", "value": "test-product-id"}
+        ]
     
     @patch('app.main.container')
     def test_get_product_not_found(self, mock_container, mock_auth):
         """Test getting non-existent product returns 404"""
-        mock_container.read_item.side_effect = Exception("Not found")
+        mock_container.read_item = AsyncMock(side_effect=Exception("Not found"))
+        mock_container.query_items.return_value = MockQueryResult([])
+        
+        response = client.get("/api/products/non-existent?category=electronics")
+        assert response.status_code == 404
         
         response = client.get("/api/products/non-existent")
         assert response.status_code == 404
@@ -134,7 +214,7 @@ class TestProductEndpoints:
     @patch('app.main.container')
     def test_create_product(self, mock_container, mock_auth):
         """Test creating a new product"""
-        mock_container.create_item.return_value = test_product
+        mock_container.create_item = AsyncMock(return_value=test_product)
         
         product_data = {
             "name": "New Product",
@@ -151,46 +231,93 @@ class TestProductEndpoints:
         assert data["name"] == product_data["name"]
         assert data["price"] == product_data["price"]
     
+    @patch('app.main.container')
+    def test_create_products_bulk(self, mock_container, mock_auth):
+        """Test bulk creation batches products per category"""
+        mock_container.execute_item_batch = AsyncMock(return_value=[])
+        
+        products = [
+            {"name": f"Book {i}", "price": 9.99, "category": "books", "sku": f"BK-{i}", "stock_quantity": 1}
+            for i in range(101)
+        ]
+        products.append({"name": "Lamp", "price": 19.99, "category": "home", "sku": "HM-1", "stock_quantity": 1})
+        
+        response = client.post("/api/products/bulk", json=products)
+        assert response.status_code == 201
+        assert len(response.json()) == 102
+        
+        batches = sorted(
+            (call.kwargs['partition_key'], len(call.kwargs['batch_operations']))
+            for call in mock_container.execute_item_batch.call_args_list
+        )
+        assert batches == [("books", 1), ("books", 100), ("home", 1)]
+    
     @patch('app.main.container')
     def test_update_product(self, mock_container, mock_auth):
         """Test updating an existing product"""
-        mock_container.read_item.return_value = test_product
-        mock_container.replace_item.return_value = test_product
+        mock_container.patch_item = AsyncMock(return_value=test_product)
         
         update_data = {
             "name": "Updated Product",
             "price": 149.99
         }
         
-        response = client.put("/api/products/test-product-id", json=update_data)
+        response = client.put("/api/products/test-product-id?category=electronics", json=update_data)
         assert response.status_code == 200
         data = response.json()
         assert "id" in data
+        assert mock_container.patch_item.call_args.kwargs['partition_key'] == "electronics"
+        
+        operations = mock_container.patch_item.call_args.kwargs['patch_operations']
+        assert {"op": "set", "path": "/name", "value": "Updated Product"} in operations
+        assert {"op": "set", "path": "/price", "value": 149.99} in operations
+        assert any(op["path"] == "/updated_at" for op in operations)
+    
+    @patch('app.main.container')
+    def test_update_product_rejects_category_change(self, mock_container, mock_auth):
+        """Test moving a product to another category is rejected"""
+        mock_container.patch_item = AsyncMock(return_value=test_product)
+        
+        response = client.put(
+            "/api/products/test-product-id?category=electronics",
+            json={"category": "books"}
+        )
+        assert response.status_code == 400
+        mock_container.patch_item.assert_not_awaited()
+        
+        response = client.put(
+            "/api/products/test-product-id?category=electronics",
+            json={"category": "electronics", "price": 149.99}
+        )
+        assert response.status_code == 200
+        operations = mock_container.patch_item.call_args.kwargs['patch_operations']
+        assert not any(op["path"] == "/category" for op in operations)
     
     @patch('app.main.container')
     def test_delete_product(self, mock_container, mock_auth):
         """Test soft deleting a product"""
-        mock_container.read_item.return_value = test_product
-        mock_container.replace_item.return_value = test_product
+        mock_container.patch_item = AsyncMock(return_value=test_product)
+        mock_container.query_items.return_value = MockQueryResult([test_product])
         
         response = client.delete("/api/products/test-product-id")
         assert response.status_code == 204
+        assert mock_container.patch_item.call_args.kwargs['partition_key'] == "electronics"
+        
+        operations = mock_container.patch_item.call_args.kwargs['patch_operations']
+        assert {"op": "set", "path": "/is_active", "value": False} in operations
     
     @patch('app.main.container')
     def test_get_products_by_category(self, mock_container, mock_auth):
         """Test getting products by category"""
-        async def mock_query_items(*args, **kwargs):
-            if 'COUNT' in kwargs.get('query', ''):
-                yield 1
-            else:
-                yield test_product
-        
-        mock_container.query_items.return_value = mock_query_items()
+        mock_container.query_items.side_effect = mock_query_items
         
         response = client.get("/api/products/category/electronics")
         assert response.status_code == 200
         data = response.json()
         assert "products" in data
+        for call in mock_container.query_items.call_args_list:
+            assert call.kwargs['partition_key'] == "electronics"
+            assert 'enable_cross_partition_query' not in call.kwargs
 
 class TestProductModel:
     """Test Pydantic models"""